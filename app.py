@@ -0,0 +1,275 @@
+"""Single entry point for the whole platform.
+
+One process, one window: login, menu, game, leaderboard and editor are
+scenes on a stack. The display, fonts, loaded level and the logged-in user
+live on the App and are shared by every scene, so switching screens costs
+nothing but a redraw.
+
+    python app.py [--profile] [--trace trace.json] [--score-server URL]
+    python app.py --measure-startup [runs]
+
+F3 shows the frame profiler (see profiler.py) in any scene. Frames are
+paced by scheduler.py: a static scene sleeps until input arrives.
+
+Startup only initializes the display and font modules, fonts come from
+fonts.py and level/score/user files are read when a scene first needs
+them. --measure-startup starts the app `runs` times in fresh interpreters
+and reports the time to the first frame as JSON.
+
+With --score-server (or SCORE_SERVER in the environment) scores are also
+sent to a shared leaderboard server, see score_server.py.
+"""
+
+import time
+
+STARTED = time.perf_counter()   # before the heavy imports, for --measure-startup
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+from fonts import get_font
+from profiler import FrameProfiler
+from scheduler import FrameScheduler
+
+FPS = 60                # upper bound; scenes animate at their own frame_rate()
+PROFILER_FPS = 4        # keeps the overlay live on a static scene
+LEVEL_FILE = "levels.json"
+GUEST = {"username": "guest", "role": "anonymous"}
+
+
+# ----------------- Scene -----------------
+class Scene:
+    size = (600, 400)
+    caption = "Sokoban Platform"
+    animation_fps = None    # frames per second while animating, None if static
+
+    def __init__(self, app):
+        self.app = app
+
+    def enter(self):
+        """Called each time the scene becomes the top of the stack."""
+
+    def handle_event(self, event):
+        pass
+
+    def update(self):
+        pass
+
+    def frame_rate(self):
+        """How often the scene needs update()/draw() without any input,
+        or None to sleep until the next event."""
+        return self.animation_fps
+
+    def draw(self, screen):
+        """Draw a frame. Return a list of rects for a partial update,
+        or None to flip the whole display."""
+        return None
+
+
+# ----------------- App -----------------
+class App:
+    def __init__(self):
+        # Seconds since app.py started, at each startup milestone
+        self.startup = {"imports": time.perf_counter() - STARTED}
+        # Only what the scenes use; mixer/joystick init can take longer than the rest
+        pygame.display.init()
+        pygame.font.init()
+        pygame.time.Clock().tick()  # starts SDL's timer, so get_ticks() counts
+        self.startup["init"] = time.perf_counter() - STARTED
+        self.first_frame_only = False
+        self.screen = None
+        self.scheduler = FrameScheduler(FPS)
+        self.user = dict(GUEST)
+        self.stack = []
+        self.running = False
+        self._level = None
+        self._level_id = None
+        self._scores = None
+        self.score_server = os.environ.get("SCORE_SERVER")
+        self._score_client = None
+        self.profiler = FrameProfiler()
+        self.trace_file = None      # written on exit when set
+
+    # ----------------- Shared data -----------------
+    def font(self, size):
+        return get_font(size)
+
+    def level(self):
+        """The current level grid, loaded from disk once."""
+        if self._level is None:
+            from persistence import read_json
+            with self.profiler.section("io"):
+                self._level = read_json(LEVEL_FILE)
+        return self._level
+
+    def set_level(self, grid):
+        self._level = grid
+        self._level_id = None
+
+    def level_id(self):
+        if self._level_id is None:
+            from score_store import level_id
+            self._level_id = level_id(self.level())
+        return self._level_id
+
+    def scores(self):
+        """The shared ScoreStore, opened on first use."""
+        if self._scores is None:
+            from score_store import open_store
+            level = self.level_id()
+            with self.profiler.section("io"):
+                self._scores = open_store(legacy_level=level, write_behind=True)
+                self._scores.add_level(level, self.level())
+        return self._scores
+
+    def score_client(self):
+        """ScoreClient for the shared leaderboard, or None when there is no server."""
+        if self._score_client is None and self.score_server:
+            from score_client import ScoreClient
+            self._score_client = ScoreClient(self.score_server)
+        return self._score_client
+
+    # ----------------- Scene stack -----------------
+    def _show(self, scene):
+        if self.screen is None or self.screen.get_size() != scene.size:
+            self.screen = pygame.display.set_mode(scene.size)
+        pygame.display.set_caption(scene.caption)
+        scene.enter()
+        self.scheduler.wake()
+
+    def push(self, scene):
+        self.stack.append(scene)
+        self._show(scene)
+
+    def pop(self):
+        self.stack.pop()
+        if self.stack:
+            self._show(self.stack[-1])
+        else:
+            self.running = False
+
+    def replace(self, scene):
+        self.stack.pop()
+        self.push(scene)
+
+    def quit(self):
+        self.running = False
+
+    # ----------------- Main loop -----------------
+    def _profiler_key(self, event):
+        """F3/F4 belong to the profiler in every scene. True if handled."""
+        if event.type != pygame.KEYDOWN or event.key not in (pygame.K_F3, pygame.K_F4):
+            return False
+        if event.key == pygame.K_F3:
+            self.profiler.toggle()
+            # Scenes that redraw only dirty rects repaint what the overlay covered
+            pygame.event.post(pygame.event.Event(pygame.VIDEOEXPOSE))
+        elif self.profiler.enabled:
+            print(f"Trace written to {self.profiler.write_trace()}")
+        return True
+
+    def run(self, scene_class):
+        profiler = self.profiler
+        self.push(scene_class(self))
+        self.running = True
+        while self.running:
+            profiler.start_frame()
+            fps = self.stack[-1].frame_rate()
+            if fps is None and profiler.enabled:
+                fps = PROFILER_FPS
+            events = self.scheduler.wait(fps)
+            profiler.lap("idle")
+            for event in events:
+                if event.type == pygame.QUIT:
+                    self.running = False
+                    break
+                if self._profiler_key(event):
+                    continue
+                self.stack[-1].handle_event(event)
+                if not self.running:
+                    break
+            if not self.running:
+                break
+            profiler.lap("events")
+
+            top = self.stack[-1]
+            top.update()
+            profiler.lap("update")
+            if not self.running or top is not self.stack[-1]:
+                continue    # update() switched scenes; draw the new one next frame
+            rects = top.draw(self.screen)
+            if profiler.enabled:
+                overlay = profiler.draw_overlay(self.screen, self.font(18))
+                if rects is not None:
+                    rects.append(overlay)
+            profiler.lap("draw")
+            if rects is None:
+                pygame.display.flip()
+            elif rects:
+                pygame.display.update(rects)
+            profiler.lap("display")
+            profiler.end_frame()
+            if self.first_frame_only:
+                self.startup["first_frame"] = time.perf_counter() - STARTED
+                self.running = False
+        if self.trace_file is not None:
+            self.profiler.write_trace(self.trace_file)
+        if self._scores is not None:
+            self._scores.close()
+        if self._score_client is not None:
+            self._score_client.close()  # unsent scores wait in its queue file
+        from persistence import flush
+        flush()     # saves still queued for the write-behind thread
+        pygame.quit()
+
+
+# ----------------- Startup measurement -----------------
+def measure_startup(runs=5):
+    """Start the app `runs` times to its first frame; returns the medians."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--first-frame"],
+                             capture_output=True, text=True, check=True).stdout
+        wall = time.perf_counter() - start
+        phases = json.loads(out.strip().splitlines()[-1])
+        phases["process"] = wall
+        samples.append(phases)
+    report = {name: statistics.median(s[name] for s in samples) for name in samples[0]}
+    report["runs"] = runs
+    return report
+
+
+def main(argv=()):
+    args = list(argv)
+    if "--measure-startup" in args:
+        i = args.index("--measure-startup")
+        runs = int(args[i + 1]) if len(args) > i + 1 else 5
+        print(json.dumps(measure_startup(runs), indent=2))
+        return
+
+    from login import LoginScene
+    app = App()
+    app.first_frame_only = "--first-frame" in args
+    if "--profile" in args:
+        app.profiler.toggle()
+    if "--trace" in args:
+        app.trace_file = args[args.index("--trace") + 1]
+        if not app.profiler.enabled:
+            app.profiler.toggle()
+    if "--score-server" in args:
+        app.score_server = args[args.index("--score-server") + 1]
+    app.run(LoginScene)
+    if app.first_frame_only:
+        print(json.dumps(app.startup))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+    sys.exit()
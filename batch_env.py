@@ -0,0 +1,202 @@
+"""Vectorized Sokoban: N boards stepped by one call, for bots and load tests.
+
+Every board is padded to the same size with a ring of wall around it, so a
+board is a row of flat cell indices and a step is a handful of NumPy
+gathers and scatters over all N boards at once. The rules are the ones in
+SokobanState.move(): walls block, one block can be pushed if the cell
+behind it is free, and a board is solved when no target is left uncovered.
+
+    env = BatchEnv(levels, num_envs=4096, max_steps=500)
+    rewards, dones = env.step(actions)      # actions: N ints, UP/RIGHT/DOWN/LEFT
+
+Finished boards (solved, or out of steps) are reset straight away; `solved`
+and `episode_steps` tell which finished and how. Throughput check:
+
+    python batch_env.py [levels.json|pack.skp|file.xsb] [--envs N] [--steps N]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from sokoban_state import SokobanState, WALL, PLAYER, BLOCK, TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET
+
+STEP_REWARD = -0.1
+BOX_ON_TARGET_REWARD = 1.0
+BOX_OFF_TARGET_REWARD = -1.0
+SOLVED_REWARD = 10.0
+
+
+class BatchEnv:
+    def __init__(self, levels, num_envs=None, max_steps=None, auto_reset=True,
+                 cycle_levels=False):
+        """`levels` is a list of grids. Board k starts on level k % len(levels);
+        with cycle_levels, a finished board moves on to the next unplayed level."""
+        levels = list(levels)
+        if not levels:
+            raise ValueError("no levels")
+        self.num_envs = num_envs or len(levels)
+        self.max_steps = max_steps
+        self.auto_reset = auto_reset
+        self.cycle_levels = cycle_levels
+        self._load_levels(levels)
+
+        n = self.num_envs
+        self.level = np.arange(n) % len(levels)
+        self._next_level = n
+        self.boxes = np.zeros((n, self.cells), dtype=bool)
+        self.player = np.zeros(n, dtype=np.int64)
+        self.unfilled = np.zeros(n, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.solved = np.zeros(n, dtype=bool)           # boards solved by the last step()
+        self.episode_steps = np.zeros(n, dtype=np.int64)  # their step counts
+        self.reset()
+
+    def _load_levels(self, levels):
+        states = [SokobanState(grid) for grid in levels]
+        self.height = max(s.height for s in states) + 2
+        self.width = max(s.width for s in states) + 2
+        self.cells = self.height * self.width
+        w = self.width
+        # UP, RIGHT, DOWN, LEFT as flat index offsets (sokoban_state.DIRECTIONS order)
+        self.offsets = np.array([-w, 1, w, -1], dtype=np.int64)
+
+        count = len(states)
+        self.level_walls = np.ones((count, self.cells), dtype=bool)
+        self.level_targets = np.zeros((count, self.cells), dtype=bool)
+        self.level_boxes = np.zeros((count, self.cells), dtype=bool)
+        self.level_player = np.zeros(count, dtype=np.int64)  # 0 is wall: no player, no moves
+        for k, s in enumerate(states):
+            for y in range(s.height):
+                row = (y + 1) * w + 1
+                for x in range(s.width):
+                    i = y * s.width + x
+                    j = row + x
+                    self.level_walls[k, j] = s.walls[i]
+                    self.level_targets[k, j] = s.targets[i]
+                    self.level_boxes[k, j] = i in s.boxes
+            if s.player is not None:
+                self.level_player[k] = (s.player // s.width + 1) * w + s.player % s.width + 1
+        has_player = self.level_player > 0
+        covered = self.level_boxes.copy()
+        covered[has_player, self.level_player[has_player]] = True
+        self.level_unfilled = (self.level_targets & ~covered).sum(axis=1)
+
+    # ----------------- Episodes -----------------
+    def reset(self, envs=None):
+        """Put boards (default: all) back at the start of their level."""
+        if envs is None:
+            envs = np.arange(self.num_envs)
+        envs = np.asarray(envs)
+        if not len(envs):
+            return
+        if self.cycle_levels:
+            count = len(self.level_walls)
+            self.level[envs] = np.arange(self._next_level, self._next_level + len(envs)) % count
+            self._next_level += len(envs)
+        level = self.level[envs]
+        self.boxes[envs] = self.level_boxes[level]
+        self.player[envs] = self.level_player[level]
+        self.unfilled[envs] = self.level_unfilled[level]
+        self.steps[envs] = 0
+
+    def step(self, actions):
+        """Apply one action per board. Returns (rewards, dones) arrays."""
+        actions = np.asarray(actions, dtype=np.int64)
+        rows = np.arange(self.num_envs)
+        level = self.level
+        walls = self.level_walls
+        targets = self.level_targets
+        cells = self.cells
+
+        d = self.offsets[actions]
+        p = self.player
+        t = p + d
+        np.clip(t, 0, cells - 1, out=t)     # only boards without a player leave the map
+        b = t + d
+        np.clip(b, 0, cells - 1, out=b)
+
+        box_t = self.boxes[rows, t]
+        blocked = walls[level, b] | self.boxes[rows, b]
+        moved = ~walls[level, t] & ~(box_t & blocked)
+        pushed = moved & box_t
+
+        on_t = targets[level, t]
+        on_b = targets[level, b]
+        # Targets covered/uncovered by this move (the player counts as cover)
+        self.unfilled += np.where(
+            moved, targets[level, p].astype(np.int64) - (on_t & ~box_t) - (pushed & on_b), 0)
+
+        pr, pt, pb = rows[pushed], t[pushed], b[pushed]
+        self.boxes[pr, pt] = False
+        self.boxes[pr, pb] = True
+        self.player = np.where(moved, t, p)
+        self.steps += 1
+
+        solved = self.unfilled == 0
+        rewards = np.full(self.num_envs, STEP_REWARD, dtype=np.float32)
+        rewards += (pushed & on_b) * BOX_ON_TARGET_REWARD
+        rewards += (pushed & on_t) * BOX_OFF_TARGET_REWARD
+        rewards += solved * SOLVED_REWARD
+        dones = solved.copy()
+        if self.max_steps is not None:
+            dones |= self.steps >= self.max_steps
+
+        self.solved = solved
+        self.episode_steps = np.where(dones, self.steps, 0)
+        if self.auto_reset and dones.any():
+            self.reset(np.flatnonzero(dones))
+        return rewards, dones
+
+    # ----------------- Views -----------------
+    def observation(self):
+        """(N, height, width) uint8 tiles in the levels.json legend (padded with wall)."""
+        level = self.level
+        tiles = np.where(self.level_targets[level], TARGET, 0).astype(np.uint8)
+        tiles[self.level_walls[level]] = WALL
+        tiles[self.boxes] = BLOCK
+        tiles[self.boxes & self.level_targets[level]] = BLOCK_ON_TARGET
+        rows = np.flatnonzero(self.player > 0)
+        players = self.player[rows]
+        tiles[rows, players] = np.where(self.level_targets[level[rows], players],
+                                        PLAYER_ON_TARGET, PLAYER)
+        return tiles.reshape(self.num_envs, self.height, self.width)
+
+    def to_grid(self, env):
+        """Board `env` as a grid, without the padding ring."""
+        tiles = self.observation()[env]
+        return tiles[1:-1, 1:-1].tolist()
+
+
+# ----------------- Throughput check -----------------
+def main(argv):
+    args = list(argv)
+    envs, steps = 4096, 1000
+    if "--envs" in args:
+        i = args.index("--envs")
+        envs = int(args[i + 1])
+        del args[i:i + 2]
+    if "--steps" in args:
+        i = args.index("--steps")
+        steps = int(args[i + 1])
+        del args[i:i + 2]
+    from level_pack import open_levels
+    levels = list(open_levels(args[0] if args else "levels.json"))
+
+    env = BatchEnv(levels, num_envs=envs, max_steps=200, cycle_levels=True)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 4, size=(steps, envs))
+    solved = 0
+    start = time.perf_counter()
+    for k in range(steps):
+        env.step(actions[k])
+        solved += int(env.solved.sum())
+    elapsed = time.perf_counter() - start
+    print(f"{envs * steps / elapsed:,.0f} steps/s ({envs} boards x {steps} steps, "
+          f"{len(levels)} levels, {solved} random-play solves)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,389 @@
+"""Headless benchmarks for the game core, rendering and persistence.
+
+Runs with SDL's dummy video driver, generates maps, score stores and user
+files of the requested sizes in a temp directory and writes the timings as
+JSON so two versions can be compared:
+
+    python benchmark.py -o before.json
+    python benchmark.py --scores 10,1000,100000,10000000 -o after.json
+    python benchmark.py compare before.json after.json [--threshold 0.2]
+
+compare exits with status 1 if any benchmark got slower than the threshold
+(median time, relative), so it can gate a kiosk release.
+"""
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pygame
+
+from sokoban_state import EMPTY, WALL, PLAYER, BLOCK, TARGET, DIRECTIONS
+from persistence import write_json_atomic, flush
+from user_store import UserStore
+
+SUITES = ("core", "render", "background", "scores", "users")
+DEFAULT_SIZES = {
+    "maps": [8, 32, 128, 512],
+    "particles": [30, 300, 3000],
+    "scores": [10, 1000, 100_000, 1_000_000],
+    "users": [100, 10_000, 100_000],
+}
+QUICK_SIZES = {
+    "maps": [8, 32],
+    "particles": [30, 300],
+    "scores": [10, 1000],
+    "users": [100, 1000],
+}
+REPEAT = 7
+FILL_CHUNK = 100_000
+
+
+# ----------------- Timing -----------------
+def measure(fn, repeat=REPEAT, number=1):
+    """Seconds per call for each of `repeat` samples of `number` calls."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": p95,
+        "samples": len(ordered),
+    }
+
+
+class Results:
+    def __init__(self, verbose=True):
+        self.rows = []
+        self.verbose = verbose
+
+    def add(self, name, params, samples, **extra):
+        row = {"name": name, "params": params, **summarize(samples), **extra}
+        self.rows.append(row)
+        if self.verbose:
+            label = ",".join(f"{k}={v}" for k, v in params.items())
+            print(f"{name:<28} {label:<24} median {format_time(row['median'])}"
+                  f"  p95 {format_time(row['p95'])}", flush=True)
+
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.2f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds:8.2f} s "
+
+
+# ----------------- Generators -----------------
+def make_map(width, height, seed=0, wall_ratio=0.1, box_ratio=0.05):
+    """Walled map with random inner walls, as many targets as boxes and a player."""
+    rng = random.Random(seed)
+    grid = [[WALL] * width for _ in range(height)]
+    inner = [(x, y) for y in range(1, height - 1) for x in range(1, width - 1)]
+    rng.shuffle(inner)
+    boxes = max(1, int(len(inner) * box_ratio))
+    walls = int(len(inner) * wall_ratio)
+    for x, y in inner:
+        grid[y][x] = EMPTY
+    px, py = inner[0]
+    grid[py][px] = PLAYER
+    for x, y in inner[1:1 + boxes]:
+        grid[y][x] = BLOCK
+    for x, y in inner[1 + boxes:1 + 2 * boxes]:
+        grid[y][x] = TARGET
+    for x, y in inner[1 + 2 * boxes:1 + 2 * boxes + walls]:
+        grid[y][x] = WALL
+    return grid
+
+
+def fill_scores(store, level, start, stop, seed=0):
+    """Bulk-insert scores numbered start..stop-1 into `level`."""
+    rng = random.Random(seed + start)
+    for chunk in range(start, stop, FILL_CHUNK):
+        end = min(stop, chunk + FILL_CHUNK)
+        store.add_many((level, f"user{n}", rng.randint(10, 100_000)) for n in range(chunk, end))
+
+
+def make_users(count):
+    users = [{"username": "admin", "password": "admin", "role": "admin"}]
+    users += [{"username": f"user{n}", "password": f"pw{n}", "role": "player"}
+              for n in range(count - 1)]
+    return users
+
+
+# ----------------- Suites -----------------
+def bench_core(results, app, sizes, repeat):
+    from game import GameScene
+
+    for size in sizes:
+        app.set_level(make_map(size, size, seed=size))
+        scene = GameScene(app)
+        rng = random.Random(size)
+        moves = [rng.choice(DIRECTIONS) for _ in range(10_000)]
+        params = {"map": f"{size}x{size}"}
+
+        def run_moves():
+            for dx, dy in moves:
+                scene.move(dx, dy)
+            while scene.state.undo():
+                pass
+
+        samples = measure(run_moves, repeat)
+        results.add("game.move", params, [s / len(moves) for s in samples])
+        results.add("game.check_win", params, measure(scene.check_win, repeat, 10_000))
+        results.add("game.find_player", params, measure(scene.find_player, repeat, 10_000))
+        results.add("game.load_level", params,
+                    measure(lambda: GameScene(app), repeat))
+
+
+def bench_render(results, app, sizes, repeat):
+    from game import GameScene
+
+    for size in sizes:
+        app.set_level(make_map(size, size, seed=size))
+        scene = GameScene(app)
+        screen = pygame.display.set_mode(scene.size)
+        params = {"map": f"{size}x{size}"}
+        scene.draw_level(screen)    # builds the static background once
+        results.add("game.draw_level", params, measure(lambda: scene.draw_level(screen), repeat, 20))
+
+        # A normal frame: one move, then only the touched cells are redrawn
+        rng = random.Random(size)
+
+        def dirty_frame():
+            dx, dy = rng.choice(DIRECTIONS)
+            scene.move(dx, dy)
+            scene.draw(screen)
+
+        scene.draw(screen)
+        results.add("game.draw_dirty_frame", params, measure(dirty_frame, repeat, 200))
+
+
+def bench_background(results, sizes, repeat):
+    import login
+    import main_menu
+    from particles import ParticleField
+
+    for module in (login, main_menu):
+        screen = pygame.display.set_mode((module.WIDTH, module.HEIGHT))
+        saved = module.background
+        try:
+            for count in sizes:
+                field = module.background = ParticleField(module.WIDTH, module.HEIGHT, count,
+                                                          seed=count)
+                field.update(module.HEIGHT / 60.0)  # fall onto the screen first
+                results.add(f"{module.__name__}.draw_background", {"particles": count},
+                            measure(lambda: module.draw_background(screen), repeat, 20))
+        finally:
+            module.background = saved
+
+
+def bench_scores(results, workdir, sizes, repeat):
+    from game import save_score
+    from main_menu import load_leaderboard
+    from replay import pack_moves
+    from score_store import ScoreStore, level_id
+
+    path = os.path.join(workdir, "scores.db")
+    grid = make_map(8, 8)
+    level = level_id(grid)
+    solution = pack_moves([0, 1, 2, 3] * 25)
+    store = ScoreStore(path)
+    filled = 0
+    try:
+        for count in sorted(sizes):
+            start = time.perf_counter()
+            fill_scores(store, level, filled, count)
+            fill_time = time.perf_counter() - start
+            filled = count
+            params = {"scores": count}
+            if count > 0:
+                results.add("scores.bulk_insert", params, [fill_time / count])
+
+            def cold_leaderboard():
+                fresh = ScoreStore(path)
+                load_leaderboard(fresh, level)
+                fresh.close()
+
+            results.add("scores.load_leaderboard_cold", params, measure(cold_leaderboard, repeat))
+            load_leaderboard(store, level)
+            results.add("scores.load_leaderboard", params,
+                        measure(lambda: load_leaderboard(store, level), repeat, 100))
+            results.add("scores.save_score", params,
+                        measure(lambda: save_score(store, level, grid, "bench", 100, solution),
+                                repeat, 10))
+            filled += repeat * 10
+    finally:
+        store.close()
+
+
+def bench_users(results, workdir, sizes, repeat):
+    path = os.path.join(workdir, "users.json")
+    for count in sizes:
+        write_json_atomic(path, make_users(count))
+        params = {"users": count}
+        last = f"user{count - 2}" if count > 1 else "admin"
+        password = f"pw{count - 2}" if count > 1 else "admin"
+
+        results.add("users.authenticate_cold", params,
+                    measure(lambda: UserStore(path).authenticate(last, password), repeat))
+        store = UserStore(path)
+        store.authenticate(last, password)
+        results.add("users.authenticate", params,
+                    measure(lambda: store.authenticate(last, password), repeat, 1000))
+        results.add("users.authenticate_miss", params,
+                    measure(lambda: store.authenticate("nobody", "x"), repeat, 1000))
+
+        # What the login screen waits for; the file is written on the writer thread
+        names = iter(range(10 ** 9))
+        results.add("users.register", params,
+                    measure(lambda: store.register_async(f"new{next(names)}", "pw"), repeat))
+        flush()
+
+
+# ----------------- Running -----------------
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(suites=SUITES, sizes=None, repeat=REPEAT, verbose=True):
+    sizes = dict(DEFAULT_SIZES, **(sizes or {}))
+    results = Results(verbose)
+    workdir = tempfile.mkdtemp(prefix="sokoban-bench-")
+    try:
+        from app import App
+        app = App()
+        pygame.display.set_mode((1, 1))    # tiles and sprites are converted for a display
+        if "core" in suites:
+            bench_core(results, app, sizes["maps"], repeat)
+        if "render" in suites:
+            bench_render(results, app, sizes["maps"], repeat)
+        if "background" in suites:
+            bench_background(results, sizes["particles"], repeat)
+        if "scores" in suites:
+            bench_scores(results, workdir, sizes["scores"], repeat)
+        if "users" in suites:
+            bench_users(results, workdir, sizes["users"], repeat)
+    finally:
+        flush()     # registrations still queued for the work directory
+        shutil.rmtree(workdir, ignore_errors=True)
+        pygame.quit()
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "sizes": sizes,
+        },
+        "results": results.rows,
+    }
+
+
+def _key(row):
+    return row["name"], json.dumps(row["params"], sort_keys=True)
+
+
+def compare(old, new, threshold=0.2):
+    """Print median changes between two result files; returns the regressions."""
+    before = {_key(row): row for row in old["results"]}
+    regressions = []
+    for row in new["results"]:
+        base = before.get(_key(row))
+        if base is None or base["median"] <= 0:
+            continue
+        change = row["median"] / base["median"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append((row, change))
+        label = ",".join(f"{k}={v}" for k, v in row["params"].items())
+        print(f"{row['name']:<28} {label:<24} {format_time(base['median'])} -> "
+              f"{format_time(row['median'])} {change:+7.1%}{flag}")
+    return regressions
+
+
+def _sizes(text):
+    return [int(float(v)) for v in text.split(",") if v]
+
+
+def main(argv):
+    if argv and argv[0] == "compare":
+        args = argv[1:]
+        threshold = 0.2
+        if "--threshold" in args:
+            i = args.index("--threshold")
+            threshold = float(args[i + 1])
+            del args[i:i + 2]
+        if len(args) != 2:
+            print(__doc__)
+            return 2
+        with open(args[0]) as f:
+            old = json.load(f)
+        with open(args[1]) as f:
+            new = json.load(f)
+        return 1 if compare(old, new, threshold) else 0
+
+    suites = SUITES
+    sizes = {}
+    repeat = REPEAT
+    output = None
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg == "--quick":
+            sizes = dict(QUICK_SIZES, **sizes)
+            repeat = 3
+        elif arg == "--only":
+            suites = args.pop(0).split(",")
+        elif arg == "--repeat":
+            repeat = int(args.pop(0))
+        elif arg in ("-o", "--output"):
+            output = args.pop(0)
+        elif arg.startswith("--") and arg[2:] in DEFAULT_SIZES:
+            sizes[arg[2:]] = _sizes(args.pop(0))
+        else:
+            print(__doc__)
+            return 2
+
+    report = run(suites, sizes, repeat)
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(report['results'])} results to {output}")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
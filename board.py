@@ -0,0 +1,226 @@
+"""Compact board representation for the solver and replay tools.
+
+A Board splits a level into two parts:
+
+* StaticLevel - walls and targets, which never change. One instance is shared
+  by every board of the same level.
+* Board       - the dynamic part: the player index and the boxes as an int
+  bitset, plus a 64-bit Zobrist hash that is updated on every move.
+
+Board.pack() turns the dynamic part into a few bytes, so millions of states
+can be kept in memory (e.g. as dict keys in a transposition table).
+"""
+
+import random
+from array import array
+
+from sokoban_state import (
+    EMPTY, WALL, PLAYER, BLOCK, TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET,
+    DIRECTIONS,
+)
+
+ZOBRIST_SEED = 0x50C0BA9
+
+# Zobrist tables by cell count; the same seed gives the same hashes in every
+# process, so hashes can be compared across a process pool.
+_zobrist_tables = {}
+
+
+def zobrist_table(cells):
+    """Two random 64-bit keys per cell: [box keys..., player keys...]."""
+    table = _zobrist_tables.get(cells)
+    if table is None:
+        rng = random.Random(ZOBRIST_SEED ^ cells)
+        table = array("Q", (rng.getrandbits(64) for _ in range(2 * cells)))
+        _zobrist_tables[cells] = table
+    return table
+
+
+def bit_cells(bits):
+    """Cell indices of the set bits of a box bitset, lowest first."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+# ----------------- Static part -----------------
+class StaticLevel:
+    __slots__ = ("width", "height", "walls", "targets", "target_bits", "zobrist")
+
+    def __init__(self, width, height, walls, targets):
+        self.width = width
+        self.height = height
+        self.walls = walls          # bytearray, 1 = wall
+        self.targets = targets      # bytearray, 1 = target
+        self.target_bits = sum(1 << i for i, t in enumerate(targets) if t)
+        self.zobrist = zobrist_table(width * height)
+
+    def neighbour(self, i, direction):
+        """Index of the cell next to i, or None if it is off the map."""
+        dx, dy = DIRECTIONS[direction]
+        x = i % self.width + dx
+        y = i // self.width + dy
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+
+# ----------------- Dynamic part -----------------
+class Board:
+    __slots__ = ("level", "player", "boxes", "hash")
+
+    def __init__(self, level, player, boxes):
+        self.level = level
+        self.player = player
+        self.boxes = boxes
+        self.hash = self._full_hash()
+
+    @classmethod
+    def from_grid(cls, grid):
+        height = len(grid)
+        width = max((len(row) for row in grid), default=0)
+        walls = bytearray(width * height)
+        targets = bytearray(width * height)
+        player = None
+        boxes = 0
+        for y, row in enumerate(grid):
+            for x in range(width):
+                i = y * width + x
+                tile = row[x] if x < len(row) else WALL
+                if tile == WALL:
+                    walls[i] = 1
+                if tile in (TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET):
+                    targets[i] = 1
+                if tile in (BLOCK, BLOCK_ON_TARGET):
+                    boxes |= 1 << i
+                elif tile in (PLAYER, PLAYER_ON_TARGET):
+                    player = i
+        return cls(StaticLevel(width, height, walls, targets), player, boxes)
+
+    @classmethod
+    def from_state(cls, state):
+        boxes = sum(1 << i for i in state.boxes)
+        level = StaticLevel(state.width, state.height,
+                            bytearray(state.walls), bytearray(state.targets))
+        return cls(level, state.player, boxes)
+
+    def _full_hash(self):
+        table = self.level.zobrist
+        cells = self.level.width * self.level.height
+        h = 0
+        boxes = self.boxes
+        while boxes:
+            low = boxes & -boxes
+            h ^= table[low.bit_length() - 1]
+            boxes ^= low
+        if self.player is not None:
+            h ^= table[cells + self.player]
+        return h
+
+    def copy(self):
+        other = Board.__new__(Board)
+        other.level = self.level
+        other.player = self.player
+        other.boxes = self.boxes
+        other.hash = self.hash
+        return other
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return (isinstance(other, Board) and self.level is other.level
+                and self.player == other.player and self.boxes == other.boxes)
+
+    # ----------------- Tiles -----------------
+    def has_box(self, i):
+        return (self.boxes >> i) & 1
+
+    def box_cells(self):
+        return bit_cells(self.boxes)
+
+    def tile(self, i):
+        level = self.level
+        if level.walls[i]:
+            return WALL
+        if self.has_box(i):
+            return BLOCK_ON_TARGET if level.targets[i] else BLOCK
+        if i == self.player:
+            return PLAYER_ON_TARGET if level.targets[i] else PLAYER
+        return TARGET if level.targets[i] else EMPTY
+
+    def tile_at(self, x, y):
+        return self.tile(y * self.level.width + x)
+
+    def to_grid(self):
+        width = self.level.width
+        return [[self.tile(y * width + x) for x in range(width)]
+                for y in range(self.level.height)]
+
+    # ----------------- Moves -----------------
+    def _move_box(self, src, dst):
+        table = self.level.zobrist
+        self.boxes ^= (1 << src) | (1 << dst)
+        self.hash ^= table[src] ^ table[dst]
+
+    def _move_player(self, dst):
+        table = self.level.zobrist
+        cells = self.level.width * self.level.height
+        self.hash ^= table[cells + self.player] ^ table[cells + dst]
+        self.player = dst
+
+    def move(self, direction):
+        """Same rules as SokobanState.move(). Returns (moved, pushed)."""
+        if self.player is None:
+            return False, False
+        level = self.level
+        target = level.neighbour(self.player, direction)
+        if target is None or level.walls[target]:
+            return False, False
+        pushed = bool(self.has_box(target))
+        if pushed:
+            beyond = level.neighbour(target, direction)
+            if beyond is None or level.walls[beyond] or self.has_box(beyond):
+                return False, False
+            self._move_box(target, beyond)
+        self._move_player(target)
+        return True, pushed
+
+    def push(self, box, direction):
+        """Push the box at `box` one cell; the player ends up where it was.
+
+        Does not check that the player can reach the push position - the
+        solver does that with its own reachability search.
+        """
+        beyond = self.level.neighbour(box, direction)
+        self._move_box(box, beyond)
+        self._move_player(box)
+
+    def is_solved(self):
+        # Same rule as check_win(): every target has a box or the player on it
+        covered = self.boxes
+        if self.player is not None:
+            covered |= 1 << self.player
+        return self.level.target_bits & ~covered == 0
+
+    # ----------------- Packing -----------------
+    def pack(self):
+        """Player index followed by the box indices, as 16/32-bit ints."""
+        cells = self.level.width * self.level.height
+        player = 0xFFFF if self.player is None else self.player
+        if cells < 0xFFFF:
+            return array("H", [player, *self.box_cells()]).tobytes()
+        player = 0xFFFFFFFF if self.player is None else self.player
+        return array("I", [player, *self.box_cells()]).tobytes()
+
+    @classmethod
+    def unpack(cls, level, data):
+        cells = level.width * level.height
+        values = array("H" if cells < 0xFFFF else "I")
+        values.frombytes(data)
+        player = values[0] if values[0] < cells else None
+        boxes = 0
+        for i in values[1:]:
+            boxes |= 1 << i
+        return cls(level, player, boxes)
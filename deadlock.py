@@ -0,0 +1,324 @@
+"""Deadlock detection shared by the solver and the level checks.
+
+Works on the flat cell indices used by SokobanState and Board
+(y * width + x), with walls and targets as bytearrays. DeadlockWatch runs
+the same checks incrementally while a level is played.
+"""
+
+import time
+
+from sokoban_state import DIRECTIONS
+
+UNREACHABLE = -1
+
+
+def spare_boxes(box_count, target_count):
+    """How many boxes may end off target: check_win() lets the player cover
+    the last target, so one when there are as many boxes as targets."""
+    return max(0, box_count - target_count + 1)
+
+
+def neighbour_table(width, height):
+    """For every cell, the index of its 4 neighbours (-1 off the map)."""
+    table = []
+    for y in range(height):
+        for x in range(width):
+            cells = []
+            for dx, dy in DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    cells.append(ny * width + nx)
+                else:
+                    cells.append(-1)
+            table.append(tuple(cells))
+    return table
+
+
+def pull_distances(width, height, walls, targets, neighbours=None):
+    """Fewest pushes to get a box from each cell onto some target.
+
+    Ignores the other boxes, so it is a lower bound. Found by "pulling" boxes
+    backwards from every target at once. Cells that can never hold a box on
+    the way to a target are UNREACHABLE - those are the static dead squares.
+    """
+    if neighbours is None:
+        neighbours = neighbour_table(width, height)
+    dist = [UNREACHABLE] * (width * height)
+    frontier = [i for i, t in enumerate(targets) if t and not walls[i]]
+    for i in frontier:
+        dist[i] = 0
+    step = 0
+    while frontier:
+        step += 1
+        following = []
+        for box in frontier:
+            for d in range(4):
+                # The box came from `prev`, pushed by a player standing at `player`
+                prev = neighbours[box][(d + 2) % 4]
+                if prev < 0 or walls[prev] or dist[prev] != UNREACHABLE:
+                    continue
+                player = neighbours[prev][(d + 2) % 4]
+                if player < 0 or walls[player]:
+                    continue
+                dist[prev] = step
+                following.append(prev)
+        frontier = following
+    return dist
+
+
+def dead_squares(width, height, walls, targets):
+    """bytearray with 1 on every floor cell a box can never leave for a target."""
+    dist = pull_distances(width, height, walls, targets)
+    return bytearray(1 if not walls[i] and d == UNREACHABLE else 0
+                     for i, d in enumerate(dist))
+
+
+# ----------------- Frozen boxes -----------------
+def _blocked(i, axis, walls, boxes, dead, neighbours, visited):
+    a = neighbours[i][axis]
+    b = neighbours[i][axis + 2]
+    if a < 0 or b < 0 or walls[a] or walls[b]:
+        return True
+    if dead[a] and dead[b]:
+        return True
+    for n in (a, b):
+        if n in visited:
+            return True     # box already being checked counts as a wall
+        if n in boxes and _frozen(n, walls, boxes, dead, neighbours, visited):
+            return True
+    return False
+
+
+def _frozen(i, walls, boxes, dead, neighbours, visited):
+    visited.add(i)
+    # axis 0 = up/down, axis 1 = right/left (index into DIRECTIONS)
+    return (_blocked(i, 0, walls, boxes, dead, neighbours, visited)
+            and _blocked(i, 1, walls, boxes, dead, neighbours, visited))
+
+
+def is_frozen(i, walls, boxes, dead, neighbours):
+    """True if the box at i can never move again, on either axis."""
+    return _frozen(i, walls, boxes, dead, neighbours, set())
+
+
+def frozen_deadlock(moved, walls, targets, boxes, dead, neighbours):
+    """Cells of frozen boxes off a target after a box was pushed to `moved`.
+
+    Only the pushed box and the boxes touching it are checked, since those
+    are the only ones a single push can freeze. Empty list = no deadlock.
+    """
+    found = []
+    for i in (moved, *neighbours[moved]):
+        if i < 0 or i not in boxes or targets[i]:
+            continue
+        if is_frozen(i, walls, boxes, dead, neighbours):
+            found.append(i)
+    return found
+
+
+# ----------------- Corrals -----------------
+CORRAL_CELLS = 48       # bigger closed-off areas are not checked
+CORRAL_MARGIN = 2       # cells of room kept around a corral for the search
+CORRAL_NODES = 200      # search budget; running out means "no deadlock proven"
+CHECK_TIME = 0.004      # seconds of corral search per move, a quarter of a 60 FPS frame
+
+
+def _corral(start, player, walls, boxes, neighbours):
+    """The closed area reachable from `start` and the boxes around it, or
+    None if the player can get in or the area is bigger than CORRAL_CELLS."""
+    area = {start}
+    fence = set()
+    stack = [start]
+    while stack:
+        i = stack.pop()
+        for n in neighbours[i]:
+            if n < 0 or walls[n] or n in area:
+                continue
+            if n in boxes:
+                fence.add(n)
+                continue
+            if n == player or len(area) >= CORRAL_CELLS:
+                return None
+            area.add(n)
+            stack.append(n)
+    return area, fence
+
+
+def corral_deadlock(moved, player, walls, targets, boxes, dead, neighbours, width, spare=0,
+                    stuck=(), deadline=None):
+    """Boxes around a closed-off area next to the box pushed to `moved`
+    that can never all be cleared, or an empty list.
+
+    A small push search is run with only those boxes on the map, inside a
+    window around the area; the player may go anywhere outside the window
+    and a box pushed out of it counts as done. Both only make the puzzle
+    easier, so "no way out" there is a real deadlock. `spare` is how many
+    boxes may stay off a target (see DeadlockWatch), `stuck` the boxes
+    already known to be. Past `deadline` (a perf_counter() time) the
+    search gives up without a verdict.
+    """
+    height = len(neighbours) // width
+    for start in neighbours[moved]:
+        if start < 0 or walls[start] or start in boxes:
+            continue
+        found = _corral(start, player, walls, boxes, neighbours)
+        if found is None:
+            continue
+        area, fence = found
+        left = spare - len(set(stuck) - fence)
+        if sum(1 for b in fence if not targets[b]) <= left:
+            continue
+        cells = area | fence
+        xs = [i % width for i in cells]
+        ys = [i // width for i in cells]
+        window = (max(0, min(xs) - CORRAL_MARGIN), max(0, min(ys) - CORRAL_MARGIN),
+                  min(width - 1, max(xs) + CORRAL_MARGIN), min(height - 1, max(ys) + CORRAL_MARGIN))
+        if not _corral_solvable(frozenset(fence), player, walls, targets, dead, neighbours,
+                                width, window, left, deadline):
+            return sorted(fence)
+    return []
+
+
+def _corral_solvable(boxes, player, walls, targets, dead, neighbours, width, window, spare,
+                     deadline):
+    x0, y0, x1, y1 = window
+    # Floor cells of the window and their floor neighbours inside it
+    links = {}
+    for y in range(y0, y1 + 1):
+        for i in range(y * width + x0, y * width + x1 + 1):
+            if not walls[i]:
+                links[i] = tuple(n for n in neighbours[i]
+                                 if n >= 0 and not walls[n] and x0 <= n % width <= x1
+                                 and y0 <= n // width <= y1)
+    border = [i for i in links if i % width in (x0, x1) or i // width in (y0, y1)]
+
+    def reach(boxes, player):
+        # The outside counts as one open room joining every border cell
+        outside = player not in links
+        stack = [i for i in border if i not in boxes] if outside else [player]
+        seen = set(stack)
+        seen.update(boxes)
+        while stack:
+            i = stack.pop()
+            if not outside and i in border_set:
+                outside = True
+                stack.extend(b for b in border if b not in seen)
+                seen.update(border)
+            for n in links[i]:
+                if n not in seen:
+                    seen.add(n)
+                    stack.append(n)
+        return seen - boxes
+
+    border_set = set(border)
+    seen_states = set()
+    stack = [(boxes, player)]
+    nodes = 0
+    while stack:
+        boxes, player = stack.pop()
+        if sum(1 for b in boxes if not targets[b]) <= spare:
+            return True
+        area = reach(boxes, player)
+        key = (boxes, min(area) if area else player)
+        if key in seen_states:
+            continue
+        seen_states.add(key)
+        nodes += 1
+        if nodes > CORRAL_NODES or (deadline is not None and nodes % 8 == 0
+                                    and time.perf_counter() > deadline):
+            return True     # not proven either way
+        for b in boxes:
+            around = neighbours[b]
+            for d in range(4):
+                behind = around[(d + 2) % 4]
+                if behind < 0 or walls[behind] or behind in boxes:
+                    continue
+                if behind in links and behind not in area:
+                    continue
+                ahead = around[d]
+                if ahead < 0 or walls[ahead] or ahead in boxes:
+                    continue
+                if ahead not in links:
+                    stack.append((boxes - {b}, b))     # pushed out: done with that one
+                    continue
+                moved = (boxes - {b}) | {ahead}
+                if dead[ahead] and not targets[ahead] and \
+                        sum(1 for c in moved if dead[c] and not targets[c]) > spare:
+                    continue
+                stack.append((moved, b))
+    return False
+
+
+# ----------------- Live checks -----------------
+class DeadlockWatch:
+    """Keeps track of deadlocks in a SokobanState as it is played.
+
+    Dead squares are found once per level; after each move update() only
+    looks at the boxes in the changed cells and their neighbours. A stuck
+    box never comes loose by playing on, so the flagged boxes are only
+    checked again after an undo; one on a dead square may still slide
+    along its wall, so cells a box has left are dropped. check_win() lets
+    the player cover the last target, so a level is only lost once more
+    boxes are stuck off target than that allows (one, when there are as
+    many boxes as targets).
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.neighbours = neighbour_table(state.width, state.height)
+        self.dead = dead_squares(state.width, state.height, state.walls, state.targets)
+        targets = sum(state.targets)
+        self.spare = spare_boxes(len(state.boxes), targets)
+        self.stuck = set()      # boxes that can never reach a target
+        self.corral = []        # boxes around a closed-off area that can't be cleared
+        self.corral_seed = None
+        self.moves = state.move_count()
+        self.update(state.boxes)
+
+    def _is_stuck(self, i):
+        state = self.state
+        if i not in state.boxes or state.targets[i]:
+            return False
+        return bool(self.dead[i]) or is_frozen(i, state.walls, state.boxes, self.dead,
+                                               self.neighbours)
+
+    def update(self, changed):
+        """Re-check after the cells in `changed` were changed by a move, undo or redo."""
+        state = self.state
+        neighbours = self.neighbours
+        near = set()
+        for i in changed:
+            near.add(i)
+            near.update(n for n in neighbours[i] if n >= 0)
+        if state.move_count() < self.moves:
+            near |= self.stuck      # an undo may have freed them
+            self.stuck = set()
+        self.moves = state.move_count()
+        self.stuck &= state.boxes   # a box pushed along a dead wall left its cell
+        self.stuck |= {i for i in near if self._is_stuck(i)}
+
+        pushed = [i for i in changed if i in state.boxes]
+        if self.corral and (any(i in state.boxes for i in changed) or
+                            any(b not in state.boxes for b in self.corral)):
+            pushed.append(self.corral_seed)
+            self.corral = []
+        deadline = time.perf_counter() + CHECK_TIME
+        for i in pushed:
+            if self.corral or len(self.stuck) > self.spare:
+                break
+            if i not in state.boxes:
+                continue
+            self.corral = corral_deadlock(i, state.player, state.walls, state.targets,
+                                          state.boxes, self.dead, neighbours, state.width,
+                                          self.spare, self.stuck, deadline)
+            self.corral_seed = i
+        return self.cells()
+
+    def deadlocked(self):
+        return len(self.stuck) > self.spare or bool(self.corral)
+
+    def cells(self):
+        """The boxes to highlight: empty unless the level can no longer be solved."""
+        if not self.deadlocked():
+            return set()
+        return self.stuck | set(self.corral)
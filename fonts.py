@@ -0,0 +1,65 @@
+"""Font loading with a persistent lookup of resolved system fonts.
+
+pygame.font.SysFont() scans every installed font (fc-list on Linux) the
+first time it is called, which is a large part of a cold start. Here the
+default font is opened directly, and a named system font is resolved with
+match_font() once and the path remembered in font_cache.json, so later
+starts open the file without scanning. Font objects are shared per
+(name, size, bold, italic).
+"""
+
+import json
+import os
+
+import pygame
+
+FONT_CACHE_FILE = "font_cache.json"
+
+_fonts = {}
+_paths = None
+
+
+def _load_paths(cache_file):
+    global _paths
+    if _paths is None:
+        try:
+            with open(cache_file, "r") as f:
+                _paths = json.load(f)
+        except (OSError, ValueError):
+            _paths = {}
+    return _paths
+
+
+def resolve(name, bold=False, italic=False, cache_file=FONT_CACHE_FILE):
+    """Path of system font `name`, or None for pygame's default font."""
+    if name is None:
+        return None
+    paths = _load_paths(cache_file)
+    key = f"{name}|{int(bold)}{int(italic)}"
+    path = paths.get(key)
+    if path is not None and os.path.exists(path):
+        return path
+    path = pygame.font.match_font(name, bold, italic)
+    if path is not None:
+        from persistence import write_json
+        paths[key] = path
+        write_json(cache_file, paths)   # on a read-only install, resolved again next start
+    return path
+
+
+def get_font(size, name=None, bold=False, italic=False):
+    key = (name, size, bold, italic)
+    font = _fonts.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        path = resolve(name, bold, italic)
+        font = pygame.font.Font(path, size)
+        # Like SysFont: fake a style the font file doesn't have
+        filename = (path or "").lower()
+        if bold and "bold" not in filename:
+            font.set_bold(True)
+        if italic and "italic" not in filename and "oblique" not in filename:
+            font.set_italic(True)
+        _fonts[key] = font
+    return font
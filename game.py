@@ -1,26 +1,24 @@
 import pygame
-import sys
-import json
-import os
 
-# Initialize pygame
-pygame.init()
+from app import App, Scene
+from sokoban_state import SokobanState, DIRECTIONS
+from deadlock import DeadlockWatch
+from planner import MovePlanner
+from renderer import TileRenderer
+from text_cache import render_text
+from replay import pack_moves
 
 # Constants
 TILE_SIZE = 64
-GRID_WIDTH = 8
-GRID_HEIGHT = 8
-WIDTH = TILE_SIZE * GRID_WIDTH
-HEIGHT = TILE_SIZE * GRID_HEIGHT
-FPS = 60
+VIEW_COLUMNS = 12   # largest view, in cells; bigger levels scroll with the player
+VIEW_ROWS = 10
+WIDTH = TILE_SIZE * VIEW_COLUMNS
+HEIGHT = TILE_SIZE * VIEW_ROWS
 
-# Colors
+# Colors (tile colors live in renderer.py)
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
-BLUE  = (0, 0, 200)
-BROWN = (139, 69, 19)
-GREEN = (0, 200, 0)
-RED   = (200, 0, 0)
+ORANGE = (255, 140, 0)  # boxes that can no longer reach a target
 
 # Level legend:
 # 0 = empty
@@ -30,157 +28,167 @@ RED   = (200, 0, 0)
 # 4 = target
 # 5 = block on target
 # 6 = player on target
-LEVEL_FILE = "levels.json"
-
-def load_level():
-    with open(LEVEL_FILE, "r") as f:
-        return json.load(f)
-
-level = load_level()
-
-
-SESSION_FILE = "session.json"
-
-def get_current_user():
-    try:
-        with open(SESSION_FILE, "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"username": "guest", "role": "anonymous"}
-
-def save_score(username, moves):
-    scores_file = "scores.json"
-    scores = []
-
-    if os.path.exists(scores_file):
-        with open(scores_file, "r") as f:
-            try:
-                scores = json.load(f)
-            except json.JSONDecodeError:
-                scores = []
-
-    scores.append({"user": username, "moves": moves})
-
-    with open(scores_file, "w") as f:
-        json.dump(scores, f, indent=4)
-
-# Find player position
-def find_player():
-    for y, row in enumerate(level):
-        for x, tile in enumerate(row):
-            if tile == 2 or tile == 6:
-                return x, y
-    return None
-
-# Draw the game
-def draw_level(screen):
-    for y, row in enumerate(level):
-        for x, tile in enumerate(row):
-            rect = pygame.Rect(x*TILE_SIZE, y*TILE_SIZE, TILE_SIZE, TILE_SIZE)
-
-            if tile == 1:
-                pygame.draw.rect(screen, BLUE, rect)   # wall
-            elif tile == 2:
-                pygame.draw.rect(screen, GREEN, rect)  # player
-            elif tile == 3:
-                pygame.draw.rect(screen, BROWN, rect)  # block
-            elif tile == 4:
-                pygame.draw.rect(screen, WHITE, rect)  # target
-            elif tile == 5:
-                pygame.draw.rect(screen, RED, rect)    # block on target
-            elif tile == 6:
-                pygame.draw.rect(screen, GREEN, rect)  # player on target
-                pygame.draw.rect(screen, WHITE, rect, 4)
-
-            pygame.draw.rect(screen, BLACK, rect, 1)
-
-# Move function
-def move(dx, dy):
-    global level
-    x, y = find_player()
-    target_x, target_y = x + dx, y + dy
-    beyond_x, beyond_y = x + 2*dx, y + 2*dy
-
-    current_tile = level[y][x]
-    target_tile = level[target_y][target_x]
-
-    # Wall → no move
-    if target_tile == 1:
-        return False
-
-    # If block
-    if target_tile in (3, 5):
-        beyond_tile = level[beyond_y][beyond_x]
-        if beyond_tile in (0, 4):  # empty or target
-            # Move block
-            level[beyond_y][beyond_x] = 5 if beyond_tile == 4 else 3
-            # Move player
-            level[target_y][target_x] = 6 if target_tile == 5 else 2
-            # Leave behind correct tile
-            level[y][x] = 4 if current_tile == 6 else 0
-            return True
-        return False  # block can’t move → invalid
-
-    # If empty or target
-    elif target_tile in (0, 4):
-        level[target_y][target_x] = 6 if target_tile == 4 else 2
-        level[y][x] = 4 if current_tile == 6 else 0
-        return True
-
-    return False
-
-
-# Check win condition
-def check_win():
-    for row in level:
-        for tile in row:
-            if tile == 4:  # any target left empty
-                return False
-    return True
-
-# Setup screen
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Sokoban Clone")
-clock = pygame.time.Clock()
-
-# Main loop
-move_count = 0
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-        elif event.type == pygame.KEYDOWN:
-            moved = False
+
+def save_score(store, level, grid, username, moves, solution):
+    store.add_level(level, grid)
+    store.add(level, username, moves, solution)
+
+
+# ----------------- Game Scene -----------------
+class GameScene(Scene):
+    size = (WIDTH, HEIGHT)
+    caption = "Sokoban Clone"
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.state = SokobanState(app.level())
+        # The window fits the level up to the largest view
+        self.size = (TILE_SIZE * max(1, min(self.state.width, VIEW_COLUMNS)),
+                     TILE_SIZE * max(1, min(self.state.height, VIEW_ROWS)))
+        self.renderer = TileRenderer(TILE_SIZE, self.size)
+        self.deadlocks = DeadlockWatch(self.state)
+        self.highlighted = self.deadlocks.cells()
+        self.planner = MovePlanner(self.state)
+        self.dragging = None        # box cell the mouse button went down on
+        self.font = app.font(30)
+        self.hud_rect = None
+        self.full_redraw = True
+        self.close_at = None        # ticks at which to go back after a win
+
+    # Find player position
+    def find_player(self):
+        return self.state.player_pos()
+
+    # Move function (rules live in SokobanState)
+    def move(self, dx, dy):
+        return self.state.move(dx, dy)
+
+    # Check win condition
+    def check_win(self):
+        return self.state.is_solved()
+
+    # Draw the game
+    def draw_level(self, screen):
+        self.renderer.draw_full(screen, self.state)
+
+    def draw_moves(self, screen):
+        """Draw the move counter; returns the rects that need updating."""
+        rects = []
+        if self.hud_rect is not None:
+            rects.append(self.renderer.draw_area(screen, self.state, self.hud_rect))
+        label = f"Moves: {self.state.move_count()}"
+        if self.highlighted:
+            label += "  Deadlock - Z to undo"
+        text = render_text(self.font, label, ORANGE if self.highlighted else WHITE)
+        self.hud_rect = screen.blit(text, (10, 10))
+        rects.append(self.hud_rect)
+        return rects
+
+    def play(self, path):
+        """Make a planned list of moves one at a time, so each is counted and undoable.
+        Stops once the level is solved: a walk may cross the last target on its way."""
+        for direction in path:
+            if self.check_win() or not self.move(*DIRECTIONS[direction]):
+                break
+
+    def after_move(self):
+        """Re-check the cells the last move touched; changed highlights get redrawn."""
+        self.planner.update(self.state.dirty)
+        cells = self.deadlocks.update(self.state.dirty)
+        if cells != self.highlighted:
+            self.state.dirty |= cells ^ self.highlighted
+            self.highlighted = cells
+
+    def draw_highlights(self, screen, cells):
+        for i in cells & self.highlighted:
+            pygame.draw.rect(screen, ORANGE, self.renderer.cell_rect(self.state, i), 4)
+
+    def enter(self):
+        self.full_redraw = True
+
+    def frame_rate(self):
+        # Static until a key or click; the win screen only needs its timer
+        return 10 if self.close_at is not None else None
+
+    def handle_event(self, event):
+        moves = self.state.move_count()
+        if event.type == pygame.VIDEOEXPOSE:
+            self.full_redraw = True
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.close_at is None:
+            cell = self.renderer.cell_at(self.state, event.pos)
+            self.dragging = cell if cell in self.state.boxes else None
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and self.close_at is None:
+            # Click a cell to walk there; drag a box to push it there
+            cell = self.renderer.cell_at(self.state, event.pos)
+            if cell is not None:
+                if self.dragging is not None:
+                    path = self.planner.push_path(self.dragging, cell)
+                else:
+                    path = self.planner.walk_path(cell)
+                self.play(path or ())
+            self.dragging = None
+        elif event.type == pygame.KEYDOWN and self.close_at is None:
+            # The move counter is the length of the move log, so undone
+            # moves stop counting and redone ones count again
             if event.key == pygame.K_UP:
-                moved = move(0, -1)
+                self.move(0, -1)
             elif event.key == pygame.K_DOWN:
-                moved = move(0, 1)
+                self.move(0, 1)
             elif event.key == pygame.K_LEFT:
-                moved = move(-1, 0)
+                self.move(-1, 0)
             elif event.key == pygame.K_RIGHT:
-                moved = move(1, 0)
-
-            if moved:  # ✅ only count real moves
-                move_count += 1
-
-    screen.fill(BLACK)
-    draw_level(screen)
-
-    # Display move counter
-    font = pygame.font.SysFont(None, 30)
-    text = font.render(f"Moves: {move_count}", True, (255, 255, 255))
-    screen.blit(text, (10, 10))
-
-    if check_win():
-        user = get_current_user()
-        save_score(user["username"], move_count)
-        screen.blit(text, (WIDTH // 2 - 100, HEIGHT // 2 - 30))
-        pygame.display.flip()
-        pygame.time.wait(2000)
-        running = False
-
-    pygame.display.flip()
-    clock.tick(FPS)
-
+                self.move(1, 0)
+            elif event.key == pygame.K_z and not event.mod & pygame.KMOD_SHIFT:
+                self.state.undo()
+            elif event.key in (pygame.K_y, pygame.K_z):   # Y or Shift+Z
+                self.state.redo()
+            elif event.key == pygame.K_ESCAPE:
+                self.app.pop()
+        if self.state.move_count() != moves:
+            self.after_move()
+
+    def update(self):
+        if self.close_at is None and self.check_win():
+            # The exact moves are stored with the score so it can be replayed
+            solution = pack_moves(self.state.directions())
+            store = self.app.scores()
+            with self.app.profiler.section("io"):
+                save_score(store, self.app.level_id(), self.app.level(),
+                           self.app.user["username"], self.state.move_count(), solution)
+            client = self.app.score_client()
+            if client is not None:
+                client.submit(self.app.level_id(), self.app.user["username"],
+                              self.state.move_count(), solution, self.app.level())
+            self.close_at = pygame.time.get_ticks() + 2000
+        elif self.close_at is not None and pygame.time.get_ticks() >= self.close_at:
+            self.app.pop()
+
+    def draw(self, screen):
+        if self.renderer.follow(self.state):
+            self.full_redraw = True     # the view scrolled
+        if self.full_redraw:
+            self.full_redraw = False
+            self.hud_rect = None
+            screen.fill(BLACK)
+            self.draw_level(screen)
+            self.draw_highlights(screen, self.highlighted)
+            self.draw_moves(screen)
+            rects = [screen.get_rect()]
+        elif self.state.dirty:
+            # Only the cells a move touched (and the counter) get redrawn
+            changed = set(self.state.dirty)
+            rects = self.renderer.draw_dirty(screen, self.state)
+            self.draw_highlights(screen, changed)
+            rects += self.draw_moves(screen)
+        else:
+            rects = []
+
+        if self.close_at is not None:
+            text = render_text(self.font, f"Moves: {self.state.move_count()}", WHITE)
+            width, height = self.size
+            rects.append(screen.blit(text, text.get_rect(center=(width // 2, height // 2))))
+        return rects
+
+
+if __name__ == "__main__":
+    App().run(GameScene)
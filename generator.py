@@ -0,0 +1,351 @@
+"""Procedural levels by reverse play.
+
+A level starts solved: a random walled room with every box on a target
+(or, as check_win() allows, all but one, with the player on the free
+target). The generator then plays backwards - the player walks and pulls
+boxes off the targets - breadth first, so the last positions it reaches
+are the ones farthest from solved in pushes. Rooms with more than BEAM
+positions at one depth go on with a random sample of them, up to
+MAX_STATES in all. Every pull is a push in reverse, so the result can
+always be solved. The solver checks the deepest positions in turn and the
+first it accepts is the level: it is dropped if its optimal solution
+takes fewer than MIN_PUSHES pushes or never moves one of the boxes. The
+difficulty of the optimal solution is
+
+    difficulty = pushes * (1 + log2(branching))
+
+where branching is the average number of pushes available at each step of
+that solution. Near-duplicates (the same room and targets up to rotation
+or mirroring, with at most NEAR_BOXES boxes in different places) are
+dropped.
+
+    python generator.py [-n 200] [--size 8x8] [--boxes 3] [--seed 0]
+                        [--workers N] [--time 2] [-o daily.json] [--play N]
+
+The output is a pack for level_pack.py and solve_pack.py: a JSON list of
+grids (one grid if -n 1), easiest first. The game itself loads a single
+grid from levels.json. Ratings go to <output minus .json>.ratings.json.
+--play N also writes level N of the pack (0 = easiest) to levels.json, so
+the game starts on it.
+"""
+
+import json
+import math
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from deadlock import neighbour_table, spare_boxes
+from level_pack import write_json_levels
+from persistence import write_json_atomic
+from sokoban_state import EMPTY, WALL, PLAYER, BLOCK, TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET
+from solver import solve, SOLVED
+
+OUTPUT_FILE = "daily.json"
+LEVEL_FILE = "levels.json"      # the one level the game plays, see app.LEVEL_FILE
+WALL_RATIO = 0.2
+MAX_STATES = 5_000      # positions the reverse search may pull from per room
+BEAM = 500              # positions kept per push depth; big rooms keep a random sample
+CANDIDATES = 8          # deepest positions handed to the solver
+MIN_PUSHES = 8          # easier levels are dropped
+NEAR_BOXES = 1          # levels this close to an accepted one are near-duplicates
+SOLVE_TIME = 2.0
+RATING_STEPS = (25, 35, 45, 55)     # difficulty thresholds for ratings 2..5
+
+
+# ----------------- Room -----------------
+def make_room(width, height, rng, wall_ratio=WALL_RATIO):
+    """Bordered room with random inner walls; returns (walls bytearray, floor list)
+    with only the largest connected floor area kept."""
+    cells = width * height
+    walls = bytearray(cells)
+    for i in range(cells):
+        x, y = i % width, i // width
+        if x in (0, width - 1) or y in (0, height - 1) or rng.random() < wall_ratio:
+            walls[i] = 1
+    neighbours = neighbour_table(width, height)
+    best = []
+    seen = bytearray(cells)
+    for start in range(cells):
+        if walls[start] or seen[start]:
+            continue
+        area = [start]
+        seen[start] = 1
+        for i in area:
+            for n in neighbours[i]:
+                if n >= 0 and not walls[n] and not seen[n]:
+                    seen[n] = 1
+                    area.append(n)
+        if len(area) > len(best):
+            best = area
+    keep = set(best)
+    for i in range(cells):
+        if i not in keep:
+            walls[i] = 1
+    return walls, best
+
+
+def reachable(player, walls, boxes, neighbours):
+    seen = {player}
+    stack = [player]
+    while stack:
+        i = stack.pop()
+        for n in neighbours[i]:
+            if n >= 0 and n not in seen and not walls[n] and n not in boxes:
+                seen.add(n)
+                stack.append(n)
+    return seen
+
+
+def pulls(area, walls, boxes, neighbours):
+    """Legal reverse moves for a player who can reach `area`:
+    (box, new box cell, new player cell)."""
+    moves = []
+    for b in boxes:
+        for d in range(4):
+            stand = neighbours[b][d]        # the player pulls from this side...
+            if stand < 0 or stand not in area:
+                continue
+            back = neighbours[stand][d]     # ...stepping back onto this cell
+            if back >= 0 and not walls[back] and back not in boxes:
+                moves.append((b, stand, back))
+    return moves
+
+
+def pushes_available(player, walls, boxes, neighbours):
+    area = reachable(player, walls, boxes, neighbours)
+    count = 0
+    for b in boxes:
+        for d in range(4):
+            behind = neighbours[b][(d + 2) % 4]
+            ahead = neighbours[b][d]
+            if behind in area and ahead >= 0 and not walls[ahead] and ahead not in boxes:
+                count += 1
+    return count
+
+
+# ----------------- Generation -----------------
+def reverse_play(width, height, box_count, rng, max_states=MAX_STATES, beam=BEAM,
+                 candidates=CANDIDATES):
+    """Candidate grids, farthest from solved first; empty if the room was too small."""
+    walls, floor = make_room(width, height, rng)
+    if len(floor) < 2 * box_count + 2:
+        return []
+    neighbours = neighbour_table(width, height)
+    # Targets away from corners, where a box could never be pulled off
+    open_cells = [i for i in floor if sum(n >= 0 and not walls[n] for n in neighbours[i]) >= 2]
+    if len(open_cells) < box_count + 1:
+        return []
+    targets = frozenset(rng.sample(open_cells, box_count))
+    spare = spare_boxes(box_count, box_count)
+
+    # A position is the boxes plus the area the player can reach (named by its
+    # smallest cell). It is solved with every box on a target and the player
+    # anywhere, or with the spare box elsewhere and the player on the free
+    # target, so the search is as deep as the optimal solution.
+    solved = [(targets, i) for i in floor if i not in targets]
+    for free in targets:
+        solved += [(targets - {free} | {i}, free) for i in floor if i not in targets]
+    seen = set()
+    layer = []
+    for boxes, player in solved:
+        area = reachable(player, walls, boxes, neighbours)
+        if (boxes, min(area)) not in seen:
+            seen.add((boxes, min(area)))
+            layer.append((boxes, player, area))
+    layers = []
+    expanded = 0
+    while layer and expanded < max_states:
+        if len(layer) > beam:
+            layer = rng.sample(layer, beam)
+        layers.append(layer)
+        expanded += len(layer)
+        following = []
+        for boxes, _, area in layer:
+            for box, new_box, player in pulls(area, walls, boxes, neighbours):
+                moved = boxes - {box} | {new_box}
+                new_area = reachable(player, walls, moved, neighbours)
+                key = (moved, min(new_area))
+                if key not in seen:
+                    seen.add(key)
+                    following.append((moved, player, new_area))
+        layer = following
+
+    found = []
+    for layer in reversed(layers):
+        # The spare box can stay where it is, so more than that have to be off target;
+        # the more boxes off target the less likely one is never pushed
+        options = [(boxes, player) for boxes, player, _ in layer if len(boxes - targets) > spare]
+        rng.shuffle(options)
+        options.sort(key=lambda option: len(option[0] - targets), reverse=True)
+        found += options[:candidates - len(found)]
+        if len(found) == candidates:
+            break
+    return [_grid(width, height, walls, targets, boxes, player) for boxes, player in found]
+
+
+def _grid(width, height, walls, targets, boxes, player):
+    grid = []
+    for y in range(height):
+        row = []
+        for x in range(width):
+            i = y * width + x
+            if walls[i]:
+                tile = WALL
+            elif i in boxes:
+                tile = BLOCK_ON_TARGET if i in targets else BLOCK
+            elif i == player:
+                tile = PLAYER_ON_TARGET if i in targets else PLAYER
+            else:
+                tile = TARGET if i in targets else EMPTY
+            row.append(tile)
+        grid.append(row)
+    return grid
+
+
+def rate(grid, time_limit=SOLVE_TIME):
+    """Optimal pushes, average branching and difficulty; None if unsolved in
+    time, or if the solution is shorter than MIN_PUSHES or leaves a box alone."""
+    result = solve(grid, time_limit=time_limit)
+    if result.status != SOLVED or result.pushes < MIN_PUSHES:
+        return None
+    height, width = len(grid), len(grid[0])
+    neighbours = neighbour_table(width, height)
+    walls = bytearray(1 if t == WALL else 0 for row in grid for t in row)
+    boxes = {i for i, t in enumerate(t for row in grid for t in row) if t in (BLOCK, BLOCK_ON_TARGET)}
+    player = next(i for i, t in enumerate(t for row in grid for t in row)
+                  if t in (PLAYER, PLAYER_ON_TARGET))
+    idle = set(boxes)       # start cells of the boxes not pushed yet
+    options = []
+    for direction, pushed in zip(result.moves, result.pushed):
+        if pushed:
+            options.append(pushes_available(player, walls, boxes, neighbours))
+        nxt = neighbours[player][direction]
+        if pushed:
+            boxes.remove(nxt)
+            boxes.add(neighbours[nxt][direction])
+            idle.discard(nxt)
+        player = nxt
+    if idle:
+        return None
+    branching = sum(options) / len(options)
+    difficulty = result.pushes * (1 + math.log2(max(branching, 1)))
+    return {"pushes": result.pushes, "moves": len(result.moves),
+            "branching": round(branching, 2), "difficulty": round(difficulty, 1),
+            "rating": 1 + sum(difficulty >= t for t in RATING_STEPS)}
+
+
+def generate_one(seed, width, height, box_count, time_limit=SOLVE_TIME):
+    """Worker: (seed, grid, rating) or None for a rejected seed."""
+    rng = random.Random(seed)
+    # Deepest first: the first one the solver accepts takes the most pushes
+    for grid in reverse_play(width, height, box_count, rng):
+        rating = rate(grid, time_limit)
+        if rating is not None:
+            return seed, grid, rating
+    return None
+
+
+# ----------------- Near-duplicates -----------------
+def _transforms(grid):
+    """The 8 rotations/mirror images of a grid."""
+    g = [list(row) for row in grid]
+    for _ in range(4):
+        yield g
+        yield [row[::-1] for row in g]
+        g = [list(row) for row in zip(*g[::-1])]    # rotate 90 degrees
+
+
+def _layout(grid):
+    """(room and targets, box cells): the level without its moving parts."""
+    room = tuple(tuple(WALL if t == WALL else (TARGET if t in (TARGET, BLOCK_ON_TARGET,
+                                                              PLAYER_ON_TARGET) else EMPTY)
+                       for t in row) for row in grid)
+    width = len(grid[0])
+    boxes = frozenset(y * width + x for y, row in enumerate(grid) for x, t in enumerate(row)
+                      if t in (BLOCK, BLOCK_ON_TARGET))
+    return room, boxes
+
+
+class Deduper:
+    def __init__(self, near=NEAR_BOXES):
+        self.near = near
+        self.rooms = {}     # room layout -> list of box sets accepted on it
+
+    def add(self, grid):
+        """True if `grid` is new; False for a near-duplicate of an accepted one."""
+        for variant in _transforms(grid):
+            room, boxes = _layout(variant)
+            for other in self.rooms.get(room, ()):
+                if len(boxes ^ other) <= 2 * self.near:
+                    return False
+        room, boxes = _layout(grid)
+        self.rooms.setdefault(room, []).append(boxes)
+        return True
+
+
+# ----------------- Driver -----------------
+def generate(count, width=8, height=8, box_count=3, seed=0, workers=None,
+             time_limit=SOLVE_TIME, max_attempts=None):
+    """Up to `count` unique (seed, grid, rating) levels, easiest first."""
+    max_attempts = max_attempts or count * 50
+    dedupe = Deduper()
+    levels = []
+    next_seed = seed
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while len(levels) < count and next_seed - seed < max_attempts:
+            batch = range(next_seed, next_seed + min(max(count, 64), seed + max_attempts - next_seed))
+            next_seed = batch.stop
+            results = pool.map(generate_one, batch, [width] * len(batch), [height] * len(batch),
+                               [box_count] * len(batch), [time_limit] * len(batch),
+                               chunksize=8)
+            for item in results:
+                if item is not None and len(levels) < count and dedupe.add(item[1]):
+                    levels.append(item)
+    levels.sort(key=lambda item: item[2]["difficulty"])
+    return levels
+
+
+def _size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height or width)
+
+
+def main(argv):
+    args = list(argv)
+    options = {"-n": "200", "--size": "8x8", "--boxes": "3", "--seed": "0",
+               "--workers": None, "--time": str(SOLVE_TIME), "-o": OUTPUT_FILE, "--play": None}
+    while args:
+        arg = args.pop(0)
+        if arg in options and args:
+            options[arg] = args.pop(0)
+        else:
+            print(__doc__)
+            return 2
+    width, height = _size(options["--size"])
+    workers = int(options["--workers"]) if options["--workers"] else None
+    levels = generate(int(options["-n"]), width, height, int(options["--boxes"]),
+                      int(options["--seed"]), workers, float(options["--time"]))
+    output = options["-o"]
+    write_json_levels(output, [grid for _, grid, _ in levels])
+    ratings_file = (output[:-5] if output.endswith(".json") else output) + ".ratings.json"
+    with open(ratings_file, "w") as f:
+        json.dump([dict(rating, index=n, seed=seed) for n, (seed, _, rating) in enumerate(levels)],
+                  f, indent=1)
+    by_rating = {}
+    for _, _, rating in levels:
+        by_rating[rating["rating"]] = by_rating.get(rating["rating"], 0) + 1
+    print(f"Wrote {len(levels)} levels to {output} (ratings: "
+          + ", ".join(f"{r}: {n}" for r, n in sorted(by_rating.items())) + f") and {ratings_file}")
+    if options["--play"] is not None:
+        n = int(options["--play"])
+        if not 0 <= n < len(levels):
+            print(f"No level {n} to play: generated {len(levels)}")
+            return 1
+        write_json_atomic(LEVEL_FILE, levels[n][1])
+        print(f"Level {n} (rating {levels[n][2]['rating']}) written to {LEVEL_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
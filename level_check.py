@@ -0,0 +1,108 @@
+"""Checks a level before the puzzle editor saves it.
+
+Cheap checks run first (entity counts, reachability, dead squares) so most
+broken levels are rejected without starting the solver. check_level_async()
+runs everything on a worker thread and returns a Future the editor polls
+from its main loop, so the UI keeps drawing while the solver works.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from deadlock import dead_squares, spare_boxes
+from sokoban_state import WALL, PLAYER, BLOCK, TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET
+import solver
+
+SOLVER_TIME_LIMIT = 5.0
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-check")
+
+
+class CheckResult:
+    def __init__(self, ok, messages, solve_result=None):
+        self.ok = ok
+        self.messages = messages        # short lines for the editor sidebar
+        self.solve_result = solve_result
+
+
+def count_entities(grid):
+    players = boxes = targets = 0
+    for row in grid:
+        for tile in row:
+            if tile in (PLAYER, PLAYER_ON_TARGET):
+                players += 1
+            if tile in (BLOCK, BLOCK_ON_TARGET):
+                boxes += 1
+            if tile in (TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET):
+                targets += 1
+    return players, boxes, targets
+
+
+def reachable_cells(grid, start):
+    """Cells the player could ever walk on: flood fill through everything
+    except walls (boxes can be pushed out of the way, so they don't block)."""
+    height = len(grid)
+    seen = {start}
+    stack = [start]
+    while stack:
+        x, y = stack.pop()
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= ny < height and 0 <= nx < len(grid[ny]) and (nx, ny) not in seen:
+                if grid[ny][nx] != WALL:
+                    seen.add((nx, ny))
+                    stack.append((nx, ny))
+    return seen
+
+
+def quick_check(grid):
+    """Checks that need no search. Returns a list of problems (empty = ok)."""
+    players, boxes, targets = count_entities(grid)
+    if players != 1:
+        return ["No player" if players == 0 else f"{players} players"]
+    problems = []
+    if boxes > targets:
+        problems.append(f"Blocks {boxes} > goals {targets}")
+    elif targets > boxes + 1:
+        problems.append(f"Goals {targets} > blocks {boxes}")
+
+    start = next((x, y) for y, row in enumerate(grid)
+                 for x, tile in enumerate(row) if tile in (PLAYER, PLAYER_ON_TARGET))
+    reach = reachable_cells(grid, start)
+    stranded = sum(1 for y, row in enumerate(grid) for x, tile in enumerate(row)
+                   if tile in (BLOCK, TARGET) and (x, y) not in reach)
+    if stranded:
+        problems.append(f"{stranded} unreachable tiles")
+
+    width = max(len(row) for row in grid)
+    walls = bytearray(width * len(grid))
+    goals = bytearray(width * len(grid))
+    for y, row in enumerate(grid):
+        for x in range(width):
+            tile = row[x] if x < len(row) else WALL
+            walls[y * width + x] = tile == WALL
+            goals[y * width + x] = tile in (TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET)
+    dead = dead_squares(width, len(grid), walls, goals)
+    stuck = sum(1 for y, row in enumerate(grid) for x, tile in enumerate(row)
+                if tile == BLOCK and dead[y * width + x])
+    # Same allowance as the solver: one box may stay off target
+    if stuck > spare_boxes(boxes, targets):
+        problems.append(f"{stuck} blocks stuck")
+    return problems
+
+
+def check_level(grid, time_limit=SOLVER_TIME_LIMIT):
+    problems = quick_check(grid)
+    if problems:
+        return CheckResult(False, problems)
+
+    result = solver.solve(grid, time_limit=time_limit)
+    if result.status == solver.SOLVED:
+        return CheckResult(True, [f"Solvable: {result.pushes} pushes"], result)
+    if result.status == solver.LIMIT:
+        # Hard levels are allowed; the admin just gets told it wasn't proven
+        return CheckResult(True, ["Not verified", "(solver timed out)"], result)
+    return CheckResult(False, [result.reason or "Unsolvable"], result)
+
+
+def check_level_async(grid, time_limit=SOLVER_TIME_LIMIT):
+    """Run check_level() on the worker thread. Returns a Future."""
+    return _executor.submit(check_level, [row[:] for row in grid], time_limit)
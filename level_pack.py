@@ -0,0 +1,251 @@
+"""Binary level packs: thousands of levels of any size in one file.
+
+Layout (all integers little-endian):
+
+    header   b"SKPK", version u16, reserved u16, level count u32
+    index    one u64 file offset per level
+    records  width u16, height u16, title length u16, title (UTF-8),
+             then the tiles, 4 bits each (low nibble first), row by row
+
+The file is read through mmap and the index gives each level's offset, so
+pack[n] decodes only level n no matter how big the pack is.
+
+Also converts to and from the levels.json grid layout and the standard
+XSB text format:
+
+    python level_pack.py pack out.skp levels.json community.xsb
+    python level_pack.py info out.skp
+    python level_pack.py json out.skp 12 level12.json
+    python level_pack.py xsb out.skp > all.xsb
+"""
+
+import json
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+
+from sokoban_state import EMPTY, WALL, PLAYER, BLOCK, TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET
+
+MAGIC = b"SKPK"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+RECORD = struct.Struct("<HHH")
+OFFSET = struct.Struct("<Q")
+
+# Each byte unpacks to two tiles
+_NIBBLES = [(b & 0x0F, b >> 4) for b in range(256)]
+
+
+# ----------------- Tiles -----------------
+def encode_tiles(grid, width):
+    flat = []
+    for row in grid:
+        flat.extend(row)
+        flat.extend([WALL] * (width - len(row)))   # ragged rows: pad with wall
+    if len(flat) % 2:
+        flat.append(0)
+    return bytes(flat[i] | (flat[i + 1] << 4) for i in range(0, len(flat), 2))
+
+
+def decode_tiles(data, width, height):
+    flat = []
+    for b in data:
+        flat.extend(_NIBBLES[b])
+    return [flat[y * width:(y + 1) * width] for y in range(height)]
+
+
+# ----------------- Reading -----------------
+class LevelPack:
+    """Read-only view of a .skp file. Supports len(), pack[n] and iteration."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a level pack")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported pack version {version}")
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, n):
+        if not 0 <= n < self.count:
+            raise IndexError(n)
+        offset = OFFSET.unpack_from(self._map, HEADER.size + n * OFFSET.size)[0]
+        width, height, title_len = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+        return width, height, start, title_len
+
+    def title(self, n):
+        _, _, start, title_len = self._record(n)
+        return self._map[start:start + title_len].decode("utf-8")
+
+    def size(self, n):
+        width, height, _, _ = self._record(n)
+        return width, height
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self.count
+        width, height, start, title_len = self._record(n)
+        start += title_len
+        data = self._map[start:start + (width * height + 1) // 2]
+        return decode_tiles(data, width, height)
+
+    def __iter__(self):
+        for n in range(self.count):
+            yield self[n]
+
+
+# ----------------- Writing -----------------
+def write_pack(path, levels):
+    """Write (title, grid) pairs - or bare grids - to a .skp file.
+
+    Levels are streamed through a temp file, so only the offset index is
+    held in memory; it is written in front once the count is known.
+    """
+    offsets = []
+    with tempfile.TemporaryFile() as body:
+        for level in levels:
+            title, grid = level if isinstance(level, tuple) else ("", level)
+            height = len(grid)
+            width = max((len(row) for row in grid), default=0)
+            title_bytes = title.encode("utf-8")
+            offsets.append(body.tell())
+            body.write(RECORD.pack(width, height, len(title_bytes)))
+            body.write(title_bytes)
+            body.write(encode_tiles(grid, width))
+
+        start = HEADER.size + len(offsets) * OFFSET.size
+        body.seek(0)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(offsets)))
+            for offset in offsets:
+                f.write(OFFSET.pack(start + offset))
+            shutil.copyfileobj(body, f)
+    return len(offsets)
+
+
+# ----------------- XSB -----------------
+XSB_TO_TILE = {"#": WALL, " ": EMPTY, "-": EMPTY, "_": EMPTY, "@": PLAYER, "+": PLAYER_ON_TARGET,
+               "$": BLOCK, "*": BLOCK_ON_TARGET, ".": TARGET}
+TILE_TO_XSB = {EMPTY: " ", WALL: "#", PLAYER: "@", BLOCK: "$", TARGET: ".",
+               BLOCK_ON_TARGET: "*", PLAYER_ON_TARGET: "+"}
+
+
+def _is_board_line(line):
+    return bool(line.strip()) and all(c in XSB_TO_TILE for c in line) and "#" in line
+
+
+def parse_xsb(text):
+    """List of (title, grid) from XSB text. Outside cells become EMPTY."""
+    levels = []
+    rows = []
+
+    def finish():
+        if rows:
+            width = max(len(r) for r in rows)
+            levels.append(("", [[XSB_TO_TILE[c] for c in r.ljust(width)] for r in rows]))
+
+    for raw in text.splitlines():
+        line = raw.rstrip("\r\n")
+        if _is_board_line(line.rstrip()):
+            rows.append(line.rstrip())
+            continue
+        if rows:
+            finish()
+            rows = []
+        # A comment or "Title:" line after a board names that board
+        stripped = line.strip()
+        if stripped.startswith(";") and levels and not levels[-1][0]:
+            levels[-1] = (stripped.lstrip("; ").strip(), levels[-1][1])
+        elif stripped.lower().startswith("title:") and levels:
+            levels[-1] = (stripped[6:].strip(), levels[-1][1])
+    finish()
+    return levels
+
+
+def to_xsb(grid, title=""):
+    lines = ["".join(TILE_TO_XSB[t] for t in row).rstrip() for row in grid]
+    if title:
+        lines.append(f"; {title}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------- JSON -----------------
+def read_json_levels(path):
+    """levels.json holds one grid; a list of grids is accepted too."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    if data and data[0] and isinstance(data[0][0], int):
+        return [data]
+    return data
+
+
+def write_json_levels(path, grids):
+    with open(path, "w") as f:
+        json.dump(grids[0] if len(grids) == 1 else grids, f, indent=4)
+
+
+def open_levels(path):
+    """Sequence of grids from a .skp, .xsb or levels.json-style file."""
+    if path.endswith(".skp"):
+        return LevelPack(path)
+    if path.endswith((".xsb", ".txt", ".sok")):
+        with open(path, "r") as f:
+            return [grid for _, grid in parse_xsb(f.read())]
+    return read_json_levels(path)
+
+
+def iter_levels(path):
+    """(title, grid) pairs from a .skp, .xsb or levels.json-style file."""
+    if path.endswith(".skp"):
+        with LevelPack(path) as pack:
+            for n in range(len(pack)):
+                yield pack.title(n), pack[n]
+    elif path.endswith((".xsb", ".txt", ".sok")):
+        with open(path, "r") as f:
+            yield from parse_xsb(f.read())
+    else:
+        for grid in read_json_levels(path):
+            yield "", grid
+
+
+# ----------------- CLI -----------------
+def main(argv):
+    if len(argv) >= 3 and argv[0] == "pack":
+        count = write_pack(argv[1], (level for path in argv[2:] for level in iter_levels(path)))
+        print(f"Wrote {count} levels to {argv[1]}")
+    elif len(argv) == 2 and argv[0] == "info":
+        with LevelPack(argv[1]) as pack:
+            print(f"{argv[1]}: {len(pack)} levels")
+    elif len(argv) == 4 and argv[0] == "json":
+        with LevelPack(argv[1]) as pack:
+            write_json_levels(argv[3], [pack[int(argv[2])]])
+    elif len(argv) == 2 and argv[0] == "xsb":
+        with LevelPack(argv[1]) as pack:
+            for n in range(len(pack)):
+                sys.stdout.write(to_xsb(pack[n], pack.title(n)) + "\n")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,134 +1,197 @@
 import pygame
-import sys
-import subprocess
-import json
+from array import array
 
-pygame.init()
+from app import App, Scene, GUEST, LEVEL_FILE
+from persistence import write_json
+from sokoban_state import SokobanState, PLAYER, PLAYER_ON_TARGET
+from level_check import check_level_async
+from particles import ParticleField, ANIMATION_FPS
+from widgets import Button, draw_text
 
 # Constants
 WIDTH, HEIGHT = 600, 400
-WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Sokoban Platform")
-
-font = pygame.font.SysFont(None, 36)
-
-STATE = "menu"
-SESSION_FILE = "session.json"
-LEVEL_FILE = "levels.json"
-
-
-# ----------------- Button -----------------
-class Button:
-    def __init__(self, x, y, w, h, text, color, text_color=BLACK):
-        self.rect = pygame.Rect(x, y, w, h)
-        self.base_color = color
-        self.hover_color = tuple(max(0, c - 30) for c in color)
-        self.pressed_color = tuple(max(0, c - 60) for c in color)
-        self.text = text
-        self.text_color = text_color
-        self.is_pressed = False
-
-    def draw(self, screen):
-        mouse_pos = pygame.mouse.get_pos()
-        if self.rect.collidepoint(mouse_pos):
-            color = self.pressed_color if self.is_pressed else self.hover_color
-        else:
-            color = self.base_color
-
-        pygame.draw.rect(screen, color, self.rect, border_radius=12)
-        label = font.render(self.text, True, self.text_color)
-        text_rect = label.get_rect(center=self.rect.center)
-        if self.is_pressed:
-            text_rect.move_ip(0, 2)
-        screen.blit(label, text_rect)
-
-    def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
-            self.is_pressed = True
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if self.is_pressed and self.rect.collidepoint(event.pos):
-                self.is_pressed = False
-                return True
-            self.is_pressed = False
-        return False
-
-
-# ----------------- User -----------------
-def get_current_user():
-    try:
-        with open(SESSION_FILE, "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"username": "guest", "role": "anonymous"}
-
-current_user = get_current_user()
-
-
-# ----------------- Utility -----------------
-def draw_text(text, x, y, color=BLACK):
-    label = font.render(text, True, color)
-    screen.blit(label, (x, y))
-
 
 # ----------------- Level Saving -----------------
 def save_level(grid):
-    # Always overwrite with the new level
-    with open(LEVEL_FILE, "w") as f:
-        json.dump(grid, f, indent=4)
+    # Always overwrite with the new level; App.level() sees it before it hits the disk
+    write_json(LEVEL_FILE, grid)
     print("✅ Level saved (overwritten)")
+    # Scores are kept per level, so the old level's leaderboard stays intact
 
-    # Clear leaderboard when new level is saved
-    with open("scores.json", "w") as f:
-        json.dump([], f, indent=4)
-    print("🏆 Leaderboard reset (new level)")
 
+# ----------------- Background -----------------
+background = ParticleField(WIDTH, HEIGHT)
+
+
+def draw_background(screen):
+    background.update()
+    background.draw(screen)
 
 
 # ----------------- Editor -----------------
-def editor_screen():
-    grid_size = 8
-    tile_size = 50
-    grid = [[0 for _ in range(grid_size)] for _ in range(grid_size)]
-    selected = 1
-
-    editing = True
-    while editing:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                editing = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    editing = False
-                elif event.key == pygame.K_0:
-                    selected = 0
-                elif event.key == pygame.K_1:
-                    selected = 1
-                elif event.key == pygame.K_2:
-                    selected = 2
-                elif event.key == pygame.K_3:
-                    selected = 3
-                elif event.key == pygame.K_4:
-                    selected = 4
-                elif event.key == pygame.K_s:
-                    save_level(grid)
-                    editing = False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                x, y = event.pos
-                gx, gy = x // tile_size, y // tile_size
-                if 0 <= gx < grid_size and 0 <= gy < grid_size:
-                    if event.button == 1:
-                        grid[gy][gx] = selected
-                    elif event.button == 3:
-                        grid[gy][gx] = 0
-
-        draw_background()
-        for y in range(grid_size):
-            for x in range(grid_size):
-                rect = pygame.Rect(x * tile_size, y * tile_size, tile_size, tile_size)
-                val = grid[y][x]
+# Each tile edit is one 64-bit entry: cell index (bits 0-23), old tile
+# (24-27), new tile (28-31) and, when a placed player displaced the old one,
+# that player's cell + 1 (bits 32+).
+def pack_edit(i, old, new, displaced):
+    return i | old << 24 | new << 28 | (displaced + 1) << 32
+
+
+def unpack_edit(entry):
+    return entry & 0xFFFFFF, (entry >> 24) & 15, (entry >> 28) & 15, (entry >> 32) - 1
+
+
+ARROWS = {pygame.K_LEFT: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_UP: (0, -1), pygame.K_DOWN: (0, 1)}
+
+
+class EditorScene(Scene):
+    size = (WIDTH, HEIGHT)
+    caption = "Sokoban Platform"
+    animation_fps = ANIMATION_FPS
+
+    area = 400          # pixels of editing area; bigger grids scroll
+    min_tile = 20
+    max_grid = 1024
+
+    def __init__(self, app, width=8, height=8, grid=None):
+        super().__init__(app)
+        self.font = app.font(36)
+        self.small_font = app.font(24)
+        self.set_board(SokobanState(grid) if grid is not None else SokobanState.empty(width, height))
+        self.selected = 1
+        self.check = None           # Future from check_level_async()
+        self.checked_grid = None    # the grid that check is running on
+        self.status = []            # sidebar lines from the last check
+        self.status_color = BLACK
+        self.close_at = None        # ticks at which to leave after a save
+
+    def set_board(self, board):
+        """Edit `board` from now on (a new size or a loaded level)."""
+        self.board = board
+        self.tile_size = max(self.min_tile, self.area // max(board.width, board.height, 1))
+        self.view_x = self.view_y = 0   # top-left visible cell
+        self.edits = array("Q")         # see pack_edit()
+        self.redo_edits = array("Q")
+
+    def resize(self, width, height):
+        """Grow or crop the grid, keeping what fits."""
+        width = max(1, min(self.max_grid, width))
+        height = max(1, min(self.max_grid, height))
+        grid = self.board.to_grid()
+        self.set_board(SokobanState([[grid[y][x] if y < len(grid) and x < len(grid[y]) else 0
+                                      for x in range(width)] for y in range(height)]))
+
+    def view_cells(self):
+        return self.area // self.tile_size
+
+    def scroll(self, dx, dy):
+        cells = self.view_cells()
+        self.view_x = max(0, min(self.view_x + dx, self.board.width - cells))
+        self.view_y = max(0, min(self.view_y + dy, self.board.height - cells))
+
+    def edit(self, x, y, tile):
+        board = self.board
+        i = y * board.width + x
+        old = board.tile(i)
+        if old == tile:
+            return
+        displaced = -1
+        if tile == PLAYER and board.player is not None and board.player != i:
+            displaced = board.player
+        board.set_tile(x, y, tile)
+        self.edits.append(pack_edit(i, old, tile, displaced))
+        del self.redo_edits[:]
+
+    def undo(self):
+        if not self.edits:
+            return
+        entry = self.edits.pop()
+        i, old, _, displaced = unpack_edit(entry)
+        board = self.board
+        board.set_tile(i % board.width, i // board.width, old)
+        if displaced >= 0:
+            tile = PLAYER_ON_TARGET if board.targets[displaced] else PLAYER
+            board.set_tile(displaced % board.width, displaced // board.width, tile)
+        self.redo_edits.append(entry)
+
+    def redo(self):
+        if not self.redo_edits:
+            return
+        entry = self.redo_edits.pop()
+        i, _, new, _ = unpack_edit(entry)
+        self.board.set_tile(i % self.board.width, i // self.board.width, new)
+        self.edits.append(entry)
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.app.pop()
+            elif event.key == pygame.K_z and not event.mod & pygame.KMOD_SHIFT:
+                self.undo()
+            elif event.key in (pygame.K_y, pygame.K_z):   # Y or Shift+Z
+                self.redo()
+            elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.resize(self.board.width + 1, self.board.height + 1)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.resize(self.board.width - 1, self.board.height - 1)
+            elif event.key == pygame.K_l:
+                self.set_board(SokobanState(self.app.level()))
+            elif event.key in ARROWS:
+                self.scroll(*ARROWS[event.key])
+            elif event.key in (pygame.K_0, pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4):
+                self.selected = event.key - pygame.K_0
+            elif event.key == pygame.K_s and self.check is None and self.close_at is None:
+                self.checked_grid = self.board.to_grid()
+                self.check = check_level_async(self.checked_grid)
+                self.status = ["Checking..."]
+                self.status_color = BLACK
+        elif event.type == pygame.MOUSEWHEEL:
+            self.scroll(-event.x, -event.y)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 3):
+            x, y = event.pos
+            gx, gy = x // self.tile_size, y // self.tile_size
+            cells = self.view_cells()
+            gx, gy = gx + self.view_x, gy + self.view_y
+            if (x // self.tile_size < cells and y // self.tile_size < cells
+                    and gx < self.board.width and gy < self.board.height):
+                if event.button == 1:
+                    self.edit(gx, gy, self.selected)
+                elif event.button == 3:
+                    self.edit(gx, gy, 0)
+
+    def update(self):
+        # Save once the background check passes on the grid still being shown
+        if self.check is not None and self.check.done():
+            result = self.check.result()
+            self.check = None
+            self.status = result.messages
+            self.status_color = (0, 150, 0) if result.ok else (200, 0, 0)
+            if self.board.to_grid() != self.checked_grid:
+                self.status = ["Level changed,", "press S again"]
+                self.status_color = BLACK
+            elif result.ok:
+                with self.app.profiler.section("io"):
+                    save_level(self.checked_grid)
+                self.app.set_level(self.checked_grid)
+                self.status.append("Saved!")
+                self.close_at = pygame.time.get_ticks() + 1500
+
+        # Leave the result on screen for a moment before closing
+        if self.close_at is not None and pygame.time.get_ticks() >= self.close_at:
+            self.app.pop()
+
+    def draw(self, screen):
+        font = self.font
+        tile_size = self.tile_size
+        draw_background(screen)
+        # Only the cells in view, however big the grid is
+        cells = self.view_cells()
+        for y in range(self.view_y, min(self.board.height, self.view_y + cells)):
+            for x in range(self.view_x, min(self.board.width, self.view_x + cells)):
+                rect = pygame.Rect((x - self.view_x) * tile_size, (y - self.view_y) * tile_size,
+                                   tile_size, tile_size)
+                val = self.board.tile_at(x, y)
                 if val == 1:
                     pygame.draw.rect(screen, (139, 69, 19), rect)
                 elif val == 2:
@@ -137,132 +200,134 @@ def editor_screen():
                     pygame.draw.rect(screen, (0, 0, 255), rect.inflate(-10, -10))
                 elif val == 4:
                     pygame.draw.circle(screen, (0, 200, 0), rect.center, tile_size // 4)
+                elif val == 5:      # only in loaded levels: block on goal
+                    pygame.draw.rect(screen, (0, 0, 255), rect.inflate(-10, -10))
+                    pygame.draw.circle(screen, (0, 200, 0), rect.center, tile_size // 4)
+                elif val == 6:      # player on goal
+                    pygame.draw.circle(screen, (0, 200, 0), rect.center, tile_size // 3 + 3)
+                    pygame.draw.circle(screen, (255, 0, 0), rect.center, tile_size // 3)
                 pygame.draw.rect(screen, (200, 200, 200), rect, 1)
 
-        draw_text(f"Selected: {selected}", 410, 50)
-        draw_text("0: Empty", 410, 90)
-        draw_text("1: Wall", 410, 130)
-        draw_text("2: Player", 410, 170)
-        draw_text("3: Block", 410, 210)
-        draw_text("4: Goal", 410, 250)
-        draw_text("Press S to Save,", 410, 350)
-        draw_text("ESC to Exit", 410, 370)
-        pygame.display.flip()
+        draw_text(screen, self.small_font, f"Grid {self.board.width}x{self.board.height}  +/-: Size", 410, 8)
+        draw_text(screen, self.small_font, "L: Load  Arrows: Scroll", 410, 26)
+        draw_text(screen, font, f"Selected: {self.selected}", 410, 50)
+        draw_text(screen, font, "0: Empty", 410, 90)
+        draw_text(screen, font, "1: Wall", 410, 130)
+        draw_text(screen, font, "2: Player", 410, 170)
+        draw_text(screen, font, "3: Block", 410, 210)
+        draw_text(screen, font, "4: Goal", 410, 250)
+        for i, line in enumerate(self.status):
+            draw_text(screen, self.small_font, line, 410, 280 + i * 20, self.status_color)
+        draw_text(screen, self.small_font, "Z: Undo  Y: Redo", 410, 330)
+        draw_text(screen, font, "Press S to Save,", 410, 350)
+        draw_text(screen, font, "ESC to Exit", 410, 370)
 
 
 # ----------------- Leaderboard -----------------
-def load_leaderboard():
-    try:
-        with open("scores.json", "r") as f:
-            scores = json.load(f)
-            scores.sort(key=lambda x: x["moves"])
-            return scores[:5]
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
-
-def leaderboard_screen():
-    global STATE
-    draw_background()
-    draw_text("🏆 Leaderboard - Top 5", 160, 50)
-
-    scores = load_leaderboard()
-    if not scores:
-        draw_text("No scores yet!", 200, 150)
-    else:
-        y = 120
-        for i, entry in enumerate(scores, start=1):
-            draw_text(f"{i}. {entry['user']} - {entry['moves']} moves", 150, y)
-            y += 40
+def load_leaderboard(store, level):
+    return store.top(level, 5)
+
+class LeaderboardScene(Scene):
+    size = (WIDTH, HEIGHT)
+    caption = "Sokoban Platform"
+    animation_fps = ANIMATION_FPS
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.font = app.font(36)
+        self.back_button = Button(200, 340, 200, 40, "Back", (200, 200, 200), self.font)
+        self.scores = []
+        self.remote = None          # Future of the shared server's scores
+
+    def enter(self):
+        # Scores only change while a game runs, so read them once per visit
+        store = self.app.scores()
+        with self.app.profiler.section("io"):
+            self.scores = load_leaderboard(store, self.app.level_id())
+        client = self.app.score_client()
+        if client is not None:
+            self.remote = client.leaderboard_async(self.app.level_id(), 5)
+
+    def update(self):
+        # The shared leaderboard replaces the local one when it arrives;
+        # if the server can't be reached the local scores stay
+        if self.remote is not None and self.remote.done():
+            if self.remote.exception() is None:
+                self.scores = self.remote.result()
+            self.remote = None
+
+    def handle_event(self, event):
+        if self.back_button.handle_event(event):
+            self.app.pop()
+
+    def draw(self, screen):
+        font = self.font
+        draw_background(screen)
+        draw_text(screen, font, "🏆 Leaderboard - Top 5", 160, 50)
+
+        if not self.scores:
+            draw_text(screen, font, "No scores yet!", 200, 150)
+        else:
+            y = 120
+            for i, entry in enumerate(self.scores, start=1):
+                draw_text(screen, font, f"{i}. {entry['user']} - {entry['moves']} moves", 150, y)
+                y += 40
 
-    back_button.draw(screen)
-    pygame.display.flip()
+        self.back_button.draw(screen)
 
 
 # ----------------- Menu -----------------
-def create_menu_buttons():
-    buttons = []
-    y = 120
-    buttons.append(Button(200, y, 200, 40, "Play Game", (144, 238, 144))); y += 60
-    buttons.append(Button(200, y, 200, 40, "Leaderboard", (173, 216, 230))); y += 60
-
-    if current_user["role"] == "admin":
-        buttons.append(Button(200, y, 200, 40, "Puzzle Editor", (255, 182, 193))); y += 60
-        buttons.append(Button(200, y, 200, 40, "Logout", (255, 160, 122))); y += 60
-        buttons.append(Button(200, y, 200, 40, "Exit", (220, 220, 220)))
-    else:
-        buttons.append(Button(200, y, 200, 40, "Logout", (255, 160, 122))); y += 60
-        buttons.append(Button(200, y, 200, 40, "Exit", (220, 220, 220)))
-    return buttons
-
-menu_buttons = create_menu_buttons()
-back_button = Button(200, 340, 200, 40, "Back", (200, 200, 200))
-
-def menu_screen():
-    draw_background()
-    draw_text(f"Logged in as: {current_user['username']} ", 190, 40)
-    for b in menu_buttons:
-        b.draw(screen)
-    pygame.display.flip()
-
-import random
-
-particles = []
-for _ in range(30):  # number of falling circles
-    x = random.randint(0, WIDTH)
-    y = random.randint(-HEIGHT, 0)
-    speed = random.uniform(0.3, 1.2)   # slower fall
-    size = random.randint(5, 12)
-    particles.append({"x": x, "y": y, "speed": speed, "size": size})
-
-def draw_background():
-    screen.fill((240, 248, 255))  # pastel blue
-
-    for p in particles:
-        pygame.draw.circle(screen, (200, 230, 255), (p["x"], p["y"]), p["size"])
-        p["y"] += p["speed"]
-
-        # Reset when off-screen
-        if p["y"] > HEIGHT:
-            p["y"] = random.randint(-20, -5)
-            p["x"] = random.randint(0, WIDTH)
-            p["speed"] = random.uniform(0.3, 1.2)
-            p["size"] = random.randint(5, 12)
-
-
-# ----------------- Main loop -----------------
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-        if STATE == "menu":
-            for b in menu_buttons:
-                if b.handle_event(event):
-                    if b.text == "Play Game":
-                        subprocess.run([sys.executable, "game.py"])
-                    elif b.text == "Leaderboard":
-                        STATE = "leaderboard"
-                    elif b.text == "Puzzle Editor":
-                        editor_screen()
-                    elif b.text == "Logout":
-                        current_user = {"username": "guest", "role": "anonymous"}
-                        with open(SESSION_FILE, "w") as f:
-                            json.dump(current_user, f)
-                        running = False
-                        pygame.quit()
-                        subprocess.run([sys.executable, "login.py"])
-                        sys.exit()
-                    elif b.text == "Exit":
-                        running = False
-
-        elif STATE == "leaderboard":
-            if back_button.handle_event(event):
-                STATE = "menu"
-
-    if STATE == "menu":
-        menu_screen()
-    elif STATE == "leaderboard":
-        leaderboard_screen()
-
-pygame.quit()
+class MenuScene(Scene):
+    size = (WIDTH, HEIGHT)
+    caption = "Sokoban Platform"
+    animation_fps = ANIMATION_FPS
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.font = app.font(36)
+        self.menu_buttons = self.create_menu_buttons()
+
+    def create_menu_buttons(self):
+        font = self.font
+        buttons = []
+        y = 120
+        buttons.append(Button(200, y, 200, 40, "Play Game", (144, 238, 144), font)); y += 60
+        buttons.append(Button(200, y, 200, 40, "Leaderboard", (173, 216, 230), font)); y += 60
+
+        if self.app.user["role"] == "admin":
+            buttons.append(Button(200, y, 200, 40, "Puzzle Editor", (255, 182, 193), font)); y += 60
+            buttons.append(Button(200, y, 200, 40, "Logout", (255, 160, 122), font)); y += 60
+            buttons.append(Button(200, y, 200, 40, "Exit", (220, 220, 220), font))
+        else:
+            buttons.append(Button(200, y, 200, 40, "Logout", (255, 160, 122), font)); y += 60
+            buttons.append(Button(200, y, 200, 40, "Exit", (220, 220, 220), font))
+        return buttons
+
+    def handle_event(self, event):
+        app = self.app
+        for b in self.menu_buttons:
+            if b.handle_event(event):
+                if b.text == "Play Game":
+                    from game import GameScene
+                    app.push(GameScene(app))
+                elif b.text == "Leaderboard":
+                    app.push(LeaderboardScene(app))
+                elif b.text == "Puzzle Editor":
+                    app.push(EditorScene(app))
+                elif b.text == "Logout":
+                    from login import LoginScene
+                    app.user = dict(GUEST)
+                    app.replace(LoginScene(app))
+                elif b.text == "Exit":
+                    app.quit()
+                return
+
+    def draw(self, screen):
+        draw_background(screen)
+        draw_text(screen, self.font, f"Logged in as: {self.app.user['username']} ", 190, 40)
+        for b in self.menu_buttons:
+            b.draw(screen)
+
+
+if __name__ == "__main__":
+    App().run(MenuScene)
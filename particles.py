@@ -0,0 +1,91 @@
+"""Falling-circle background shared by the login and menu screens.
+
+Positions, speeds and sizes live in NumPy arrays and are advanced (and
+respawned) in one vectorized step per frame. Each circle size is drawn
+once into a sprite, and a frame is a single screen.blits() call, so
+thousands of particles fit in a 60 FPS frame.
+
+Speeds are in pixels per second and update() measures the time since the
+previous frame, so the fall looks the same at any frame rate.
+"""
+
+import time
+
+import numpy as np
+import pygame
+
+BACKGROUND = (240, 248, 255)    # pastel sky blue
+COLOR = (200, 230, 255)
+COUNT = 30
+ANIMATION_FPS = 30      # scenes with this background animate at this rate
+SPEED = (18.0, 72.0)    # px/s: the old 0.3-1.2 px per frame at 60 FPS
+SIZES = (5, 12)         # radius range, inclusive
+MAX_DT = 0.25           # covers unfocused frame rates; a long stall must not teleport everything
+
+
+class ParticleField:
+    def __init__(self, width, height, count=COUNT, color=COLOR, background=BACKGROUND,
+                 speed=SPEED, sizes=SIZES, seed=None):
+        self.width = width
+        self.height = height
+        self.color = color
+        self.background = background
+        self.speed_range = speed
+        self.size_range = sizes
+        self.rng = np.random.default_rng(seed)
+        self._sprites = None
+        self._last = None
+        self.set_count(count)
+
+    def set_count(self, count):
+        """(Re)spawn `count` particles spread over and above the screen."""
+        rng = self.rng
+        self.x = rng.uniform(0, self.width, count).astype(np.float32)
+        self.y = rng.uniform(-self.height, 0, count).astype(np.float32)
+        self.speed = rng.uniform(*self.speed_range, count).astype(np.float32)
+        self.size = rng.integers(self.size_range[0], self.size_range[1] + 1, count, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.x)
+
+    def _build_sprites(self):
+        """One colorkeyed circle surface per radius, indexed by radius."""
+        key = (255, 0, 255) if self.color != (255, 0, 255) else (0, 255, 0)
+        converted = pygame.display.get_surface() is not None
+        sprites = [None] * (self.size_range[1] + 1)
+        for r in range(self.size_range[0], self.size_range[1] + 1):
+            sprite = pygame.Surface((2 * r + 1, 2 * r + 1))
+            sprite.fill(key)
+            pygame.draw.circle(sprite, self.color, (r, r), r)
+            sprite.set_colorkey(key)
+            sprites[r] = sprite.convert() if converted else sprite
+        self._sprites = sprites
+
+    # ----------------- Frame -----------------
+    def update(self, dt=None):
+        """Advance by `dt` seconds (default: time since the last update)."""
+        now = time.perf_counter()
+        if dt is None:
+            dt = 0.0 if self._last is None else min(now - self._last, MAX_DT)
+        self._last = now
+
+        self.y += self.speed * dt
+        gone = np.flatnonzero(self.y > self.height)
+        if len(gone):
+            rng = self.rng
+            n = len(gone)
+            self.y[gone] = rng.uniform(-20, -5, n)
+            self.x[gone] = rng.uniform(0, self.width, n)
+            self.speed[gone] = rng.uniform(*self.speed_range, n)
+            self.size[gone] = rng.integers(self.size_range[0], self.size_range[1] + 1, n)
+
+    def draw(self, screen):
+        screen.fill(self.background)
+        if self._sprites is None:
+            self._build_sprites()
+        sprites = self._sprites
+        visible = self.y > -self.size   # most of them still wait above the screen
+        size = self.size[visible]
+        left = (self.x[visible] - size).astype(np.int32).tolist()
+        top = (self.y[visible] - size).astype(np.int32).tolist()
+        screen.blits([(sprites[s], (x, y)) for s, x, y in zip(size.tolist(), left, top)], False)
@@ -0,0 +1,222 @@
+"""Write-behind persistence: file writes happen off the UI thread.
+
+Callers hand their data over and carry on. One background thread takes
+what has been queued, waits BATCH_DELAY for more to arrive, then commits
+the batch: a JSON file is written once with its newest contents however
+many times it was saved, and other jobs (score inserts, user
+registrations) get every item queued since the last batch in one call.
+Files are committed with write_json_atomic(): temp file, fsync, rename,
+so a crash leaves either the old file or the new one.
+
+read_json() returns a file's queued contents until they are on disk, so
+the game always reads its own writes. flush() waits until everything is
+committed; it also runs at exit.
+"""
+
+import atexit
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+BATCH_DELAY = 0.05      # seconds to let a burst of writes gather before committing
+
+# mkstemp() makes 0600 files; new files get the usual umask permissions
+# instead. Read once here, since os.umask() can't be read without setting it.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+# ----------------- Atomic files -----------------
+def write_text_atomic(path, text):
+    """Write to a temp file in the same directory, fsync, then rename.
+    The file keeps its permissions (umask defaults for a new one)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    try:
+        # Make the rename itself durable (not possible on Windows)
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def write_json_atomic(path, data, indent=4):
+    write_text_atomic(path, json.dumps(data, indent=indent))
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+# ----------------- Writer -----------------
+class WriteBehind:
+    def __init__(self, batch_delay=BATCH_DELAY):
+        self.batch_delay = batch_delay
+        self.batches = 0
+        self.errors = []            # (job key, exception) for commits that failed
+        self._cond = threading.Condition()
+        self._jobs = OrderedDict()  # key -> (handler, items)
+        self._files = {}            # path -> (text, signature once committed)
+        self._busy = False
+        self._flushing = False
+        self._closed = False
+        self._thread = None
+
+    def submit(self, key, handler, item):
+        """Queue `item`. On the writer thread, handler(items) is called once
+        per batch with everything queued under `key` since the last one."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("write-behind queue is closed")
+            job = self._jobs.get(key)
+            if job is None:
+                self._jobs[key] = (handler, [item])
+            else:
+                job[1].append(item)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def write_json(self, path, data, indent=4):
+        """Save `data` to `path` in the background. The data is serialized
+        now, so the caller may change it afterwards."""
+        text = json.dumps(data, indent=indent)
+        with self._cond:
+            self._files[path] = (text, None)
+        self.submit(("file", path), self._commit_file, (path, text))
+
+    def _commit_file(self, items):
+        path, text = items[-1]      # only the newest version is worth writing
+        write_text_atomic(path, text)
+        signature = file_signature(path)
+        with self._cond:
+            if self._files.get(path, (None,))[0] is text:
+                self._files[path] = (text, signature)
+
+    def read_json(self, path):
+        """Contents of `path`, including a write still in the queue."""
+        with self._cond:
+            entry = self._files.get(path)
+        if entry is not None:
+            text, signature = entry
+            # Once on disk, the copy is only good until someone else changes the file
+            if signature is None or signature == file_signature(path):
+                return json.loads(text)
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def pending(self):
+        with self._cond:
+            return sum(len(items) for _, items in self._jobs.values())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs and not self._closed:
+                    self._cond.wait()
+                if not self._jobs:
+                    return
+                deadline = time.monotonic() + self.batch_delay
+                while not self._flushing and not self._closed:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                jobs, self._jobs = self._jobs, OrderedDict()
+                self._busy = True
+            for key, (handler, items) in jobs.items():
+                try:
+                    handler(items)
+                except Exception as exc:
+                    self.errors.append((key, exc))
+                    print(f"write-behind: {key} failed: {exc}", file=sys.stderr)
+            with self._cond:
+                self._busy = False
+                self.batches += 1
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is committed. False on timeout."""
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: not self._jobs and not self._busy, timeout)
+            finally:
+                self._flushing = False
+
+    def close(self, timeout=None):
+        """Commit everything and stop the writer thread."""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+_writer = None
+
+
+def writer():
+    """The shared WriteBehind queue, flushed when the program exits."""
+    global _writer
+    if _writer is None:
+        _writer = WriteBehind()
+    return _writer
+
+
+def _forget_writer():
+    # A forked child has the parent's queue but not its thread; start afresh
+    global _writer
+    _writer = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_writer)
+
+
+def write_json(path, data, indent=4):
+    writer().write_json(path, data, indent)
+
+
+def read_json(path):
+    return writer().read_json(path)
+
+
+def flush(timeout=None):
+    if _writer is None:
+        return True
+    return _writer.flush(timeout)
+
+
+atexit.register(flush)
@@ -0,0 +1,181 @@
+"""Mouse movement: walking paths and box push macros.
+
+walk_path() is a breadth-first search from the player over the free floor,
+so the walk is as short as possible. push_path() plans the fewest pushes
+that bring one box to a cell with every other box left where it is, then
+fills in the shortest walk before each push. Both give plain move
+directions, so a macro is played and recorded one move at a time.
+
+Both searches stop as soon as they reach the cell asked for and keep their
+queue, so the next click carries on where the last one stopped instead of
+starting over: the walking map is kept until the player or a box moves,
+the push map of a box until any box moves. On a big map a click near the
+player costs a small search, not a flood of the whole floor.
+"""
+
+from collections import deque
+
+from deadlock import neighbour_table
+
+MAX_PUSH_STATES = 20_000    # box positions searched for one drag before giving up
+MAX_DETOUR = 1024           # cells searched to walk round a box between pushes
+
+
+class _Search:
+    """A breadth-first search that can be stopped and carried on later."""
+
+    def __init__(self, starts):
+        self.parents = {s: None for s in starts}
+        self.queue = deque(starts)
+
+
+class MovePlanner:
+    def __init__(self, state):
+        self.state = state
+        self.neighbours = neighbour_table(state.width, state.height)
+        self._walk = None       # (player cell, walking _Search from it)
+        self._pushes = {}       # box cell -> push _Search
+
+    def update(self, changed):
+        """Drop the cached maps if a move touching `changed` cells moved a box."""
+        boxes = self.state.boxes
+        if any(i in boxes for i in changed):
+            self._walk = None
+            self._pushes.clear()
+
+    # ----------------- Walking -----------------
+    def _walk_until(self, search, blocked, goals=(), limit=None):
+        """Carry on a walking search until every cell in `goals` is found,
+        `limit` cells are, or there is nowhere left to go."""
+        walls = self.state.walls
+        neighbours = self.neighbours
+        parents = search.parents
+        queue = search.queue
+        left = {g for g in goals if g not in parents}
+        if goals and not left:
+            return
+        while queue:
+            i = queue.popleft()
+            for d, n in enumerate(neighbours[i]):
+                if n < 0 or walls[n] or n in parents or n in blocked:
+                    continue
+                parents[n] = (i, d)
+                queue.append(n)
+                if goals:
+                    left.discard(n)
+                    if not left:
+                        return
+            if limit is not None and len(parents) >= limit:
+                return
+
+    def _bfs(self, start, blocked, goals=(), limit=None):
+        """{cell: (previous cell, direction)} for the cells walked to from `start`."""
+        search = _Search((start,))
+        self._walk_until(search, blocked, goals, limit)
+        return search.parents
+
+    @staticmethod
+    def _path(parents, goal):
+        if goal not in parents:
+            return None
+        path = []
+        step = parents[goal]
+        while step is not None:
+            goal, d = step
+            path.append(d)
+            step = parents[goal]
+        path.reverse()
+        return path
+
+    def _reach(self, goals):
+        """Walking map from the player, searched far enough to hold `goals`
+        (or all the floor the player can get to)."""
+        state = self.state
+        if self._walk is None or self._walk[0] != state.player:
+            self._walk = (state.player, _Search((state.player,)))
+        search = self._walk[1]
+        self._walk_until(search, state.boxes, goals)
+        return search.parents
+
+    def walk_path(self, goal):
+        """Directions of a shortest walk to cell `goal`, or None if it can't be reached."""
+        state = self.state
+        if state.player is None or state.walls[goal] or goal in state.boxes:
+            return None
+        return self._path(self._reach((goal,)), goal)
+
+    # ----------------- Pushing -----------------
+    def _push_search(self, box):
+        """Push search for the box at `box`. Its nodes are (cell, side): the
+        box on `cell` with the player on `side` of it (an index into
+        DIRECTIONS), each mapped to the node before the last push."""
+        search = self._pushes.get(box)
+        if search is None:
+            state = self.state
+            others = state.boxes - {box}
+            around = self.neighbours[box]
+            sides = [n for n in around if n >= 0 and not state.walls[n] and n not in others]
+            reach = self._reach(sides)
+            search = _Search([(box, s) for s, n in enumerate(around) if n in reach])
+            self._pushes[box] = search
+        return search
+
+    def _push_until(self, search, box, goal):
+        walls = self.state.walls
+        neighbours = self.neighbours
+        others = self.state.boxes - {box}
+        parents = search.parents
+        queue = search.queue
+        while queue and len(parents) < MAX_PUSH_STATES:
+            if any((goal, s) in parents for s in range(4)):
+                return
+            node = queue.popleft()
+            at, side = node
+            dest = neighbours[at][(side + 2) % 4]
+            if dest < 0 or walls[dest] or dest in others:
+                continue
+            # After the push the player stands where the box was; find the
+            # sides of the box it can walk round to from there
+            sides = [n for n in neighbours[dest] if n >= 0 and not walls[n] and n not in others]
+            blocked = set(others)
+            blocked.add(dest)
+            area = self._bfs(at, blocked, sides, MAX_DETOUR)
+            for s, n in enumerate(neighbours[dest]):
+                following = (dest, s)
+                if n in area and following not in parents:
+                    parents[following] = node
+                    queue.append(following)
+
+    def push_path(self, box, goal):
+        """Directions that push the box at `box` to `goal` in the fewest
+        pushes (and the shortest walks between them), or None."""
+        state = self.state
+        if box not in state.boxes or state.player is None:
+            return None
+        search = self._push_search(box)
+        self._push_until(search, box, goal)
+        chains = []
+        for s in range(4):
+            node = (goal, s)
+            if node in search.parents:
+                chain = [node]
+                while search.parents[node] is not None:
+                    node = search.parents[node]
+                    chain.append(node)
+                chains.append(chain[::-1])
+        if not chains:
+            return None
+        chain = min(chains, key=len)
+
+        others = state.boxes - {box}
+        player = state.player
+        path = []
+        for at, side in chain[:-1]:
+            # Walk round to `side` of the box, then push it the other way
+            behind = self.neighbours[at][side]
+            blocked = set(others)
+            blocked.add(at)
+            path += self._path(self._bfs(player, blocked, (behind,)), behind)
+            path.append((side + 2) % 4)
+            player = at
+        return path
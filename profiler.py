@@ -0,0 +1,169 @@
+"""Per-frame instrumentation for the App loop.
+
+The loop calls lap() after each phase of a frame (events, update, draw,
+display, idle), and I/O call sites wrap themselves in section("io"). While
+the profiler is off every call returns straight away, so it can stay wired
+in on the kiosks.
+
+F3 toggles it with an overlay of frame-time percentiles, F4 writes the
+recorded spans as a Chrome trace (load it in chrome://tracing or Perfetto).
+Start with `python app.py --profile --trace trace.json` to record from the
+first frame and save the trace on exit.
+"""
+
+import os
+import time
+from collections import deque
+
+import pygame
+
+from persistence import write_json
+
+HISTORY = 600           # frames kept for the percentiles (10 s at 60 FPS)
+MAX_EVENTS = 200_000    # spans kept for the trace
+OVERLAY_REFRESH_MS = 250
+PHASES = ("events", "update", "draw", "display", "idle")
+
+OVERLAY_BG = (0, 0, 0)     # opaque: redrawn over itself every frame
+OVERLAY_FG = (255, 255, 0)
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class _NullSection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class _Section:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._add(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, history=HISTORY, max_events=MAX_EVENTS):
+        self.enabled = False
+        self.frames = deque(maxlen=history)    # seconds per frame
+        self.history = history
+        self.sections = {}                      # name -> deque of seconds per frame
+        self.events = deque(maxlen=max_events)  # (name, start ns, duration ns)
+        self._frame = {}
+        self._frame_start = self._mark = 0
+        self._overlay = None
+        self._overlay_at = 0
+
+    # ----------------- Recording -----------------
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._frame.clear()
+        self._frame_start = self._mark = time.perf_counter_ns()
+
+    def _add(self, name, start, end):
+        self._frame[name] = self._frame.get(name, 0) + (end - start)
+        self.events.append((name, start, end - start))
+
+    def start_frame(self):
+        if self.enabled:
+            self._frame.clear()
+            self._frame_start = self._mark = time.perf_counter_ns()
+
+    def lap(self, name):
+        """Charge the time since the previous lap (or the frame start) to `name`."""
+        if self.enabled:
+            now = time.perf_counter_ns()
+            self._add(name, self._mark, now)
+            self._mark = now
+
+    def section(self, name):
+        """Context manager timing a block, e.g. `with profiler.section("io"):`."""
+        if self.enabled:
+            return _Section(self, name)
+        return _NULL_SECTION
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        self.events.append(("frame", self._frame_start, now - self._frame_start))
+        self.frames.append((now - self._frame_start) / 1e9)
+        for name in self._frame:
+            if name not in self.sections:
+                self.sections[name] = deque(maxlen=self.history)
+        for name, samples in self.sections.items():
+            samples.append(self._frame.get(name, 0) / 1e9)
+
+    # ----------------- Reporting -----------------
+    def summary(self):
+        """{"frame" or section name: (p50, p95, p99) in ms}."""
+        result = {}
+        for name, samples in [("frame", self.frames)] + list(self.sections.items()):
+            ordered = sorted(samples)
+            result[name] = tuple(percentile(ordered, p) * 1000 for p in (0.5, 0.95, 0.99))
+        return result
+
+    def overlay_lines(self):
+        summary = self.summary()
+        frame = summary.pop("frame")
+        fps = len(self.frames) / sum(self.frames) if self.frames and sum(self.frames) else 0
+        lines = [f"frame  p50 {frame[0]:5.2f}  p95 {frame[1]:5.2f}  p99 {frame[2]:5.2f} ms",
+                 f"{fps:5.1f} fps over {len(self.frames)} frames",
+                 "ms            p50        p95        p99"]
+        names = [n for n in PHASES if n in summary] + sorted(n for n in summary if n not in PHASES)
+        for name in names:
+            p50, p95, p99 = summary[name]
+            lines.append(f"{name:<8}    {p50:5.2f}      {p95:5.2f}      {p99:5.2f}")
+        lines.append("F3 hide  F4 save trace")
+        return lines
+
+    def draw_overlay(self, screen, font):
+        """Blit the overlay in the top-right corner; returns its rect."""
+        now = pygame.time.get_ticks()
+        if self._overlay is None or now - self._overlay_at >= OVERLAY_REFRESH_MS:
+            self._overlay_at = now
+            rendered = [font.render(line, True, OVERLAY_FG) for line in self.overlay_lines()]
+            width = max(s.get_width() for s in rendered) + 8
+            if self._overlay is not None:   # never shrink, or the old edge stays on screen
+                width = max(width, self._overlay.get_width())
+            height = sum(s.get_height() for s in rendered) + 8
+            overlay = pygame.Surface((width, height))
+            overlay.fill(OVERLAY_BG)
+            y = 4
+            for surface in rendered:
+                overlay.blit(surface, (4, y))
+                y += surface.get_height()
+            self._overlay = overlay
+        return screen.blit(self._overlay, (screen.get_width() - self._overlay.get_width(), 0))
+
+    # ----------------- Trace export -----------------
+    def trace(self):
+        """The recorded spans in Chrome trace-event format."""
+        pid = os.getpid()
+        events = [{"name": name, "cat": "frame" if name == "frame" else "section", "ph": "X",
+                   "ts": start / 1000, "dur": duration / 1000, "pid": pid, "tid": 1}
+                  for name, start, duration in self.events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path=None):
+        if path is None:
+            path = time.strftime("trace-%Y%m%d-%H%M%S.json")
+        write_json(path, self.trace(), indent=None)
+        return path
@@ -0,0 +1,206 @@
+"""Dirty-rectangle renderer for the game board, for maps of any size.
+
+Tile surfaces are built once per tile size. The static layer (floor, walls,
+targets) is pre-rendered in chunks of CHUNK_TILES x CHUNK_TILES cells, built
+the first time they scroll into view and kept in a small LRU. A camera
+follows the player; a full redraw blits the few chunks under the viewport
+plus the boxes/player inside it, and a normal frame only re-blits the
+cells a move touched. Nothing scales with the size of the map.
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+from sokoban_state import EMPTY, WALL, PLAYER, BLOCK, TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET
+
+# Colors
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+BLUE  = (0, 0, 200)
+BROWN = (139, 69, 19)
+GREEN = (0, 200, 0)
+RED   = (200, 0, 0)
+
+CHUNK_TILES = 8         # static terrain is cached in squares of this many cells
+MAX_CHUNKS = 48         # ~48 MB at 64 px tiles; a viewport needs far fewer
+FOLLOW_MARGIN = 2       # cells kept between the player and the view edge
+
+# Pre-rendered tiles by tile size
+_tile_cache = {}
+
+
+def tile_surfaces(tile_size):
+    """One surface per legend tile, each with its grid line drawn in."""
+    tiles = _tile_cache.get(tile_size)
+    if tiles is not None:
+        return tiles
+
+    tiles = {}
+    rect = pygame.Rect(0, 0, tile_size, tile_size)
+    for tile, color in ((EMPTY, BLACK), (WALL, BLUE), (PLAYER, GREEN), (BLOCK, BROWN),
+                        (TARGET, WHITE), (BLOCK_ON_TARGET, RED), (PLAYER_ON_TARGET, GREEN)):
+        surface = pygame.Surface((tile_size, tile_size))
+        surface.fill(color)
+        if tile == PLAYER_ON_TARGET:
+            pygame.draw.rect(surface, WHITE, rect, 4)
+        pygame.draw.rect(surface, BLACK, rect, 1)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        tiles[tile] = surface
+    _tile_cache[tile_size] = tiles
+    return tiles
+
+
+class TileRenderer:
+    def __init__(self, tile_size, view_size=None):
+        """`view_size` is the on-screen size in pixels; None shows the whole map."""
+        self.tile_size = tile_size
+        self.tiles = tile_surfaces(tile_size)
+        self.view_size = view_size
+        self.camera = pygame.Rect(0, 0, 0, 0)   # the part of the map on screen, in map pixels
+        self._chunks = OrderedDict()            # (cx, cy) -> static terrain surface
+        self._state = None
+
+    def _use(self, state):
+        if state is self._state:
+            return
+        self._state = state
+        self._chunks.clear()
+        size = self.tile_size
+        w, h = self.view_size or (state.width * size, state.height * size)
+        self.camera = pygame.Rect(0, 0, w, h)
+        self.follow(state)
+
+    def invalidate(self):
+        """Forget the cached terrain (after walls or targets changed)."""
+        self._chunks.clear()
+
+    # ----------------- Static terrain -----------------
+    def _static_tile(self, state, i):
+        if state.walls[i]:
+            return WALL
+        return TARGET if state.targets[i] else EMPTY
+
+    def _chunk(self, state, cx, cy):
+        key = (cx, cy)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+        size = self.tile_size
+        chunk = pygame.Surface((CHUNK_TILES * size, CHUNK_TILES * size))
+        x0, y0 = cx * CHUNK_TILES, cy * CHUNK_TILES
+        for y in range(y0, min(state.height, y0 + CHUNK_TILES)):
+            for x in range(x0, min(state.width, x0 + CHUNK_TILES)):
+                tile = self._static_tile(state, y * state.width + x)
+                chunk.blit(self.tiles[tile], ((x - x0) * size, (y - y0) * size))
+        if pygame.display.get_surface() is not None:
+            chunk = chunk.convert()
+        self._chunks[key] = chunk
+        if len(self._chunks) > MAX_CHUNKS:
+            self._chunks.popitem(last=False)
+        return chunk
+
+    # ----------------- Camera -----------------
+    def follow(self, state, margin=FOLLOW_MARGIN):
+        """Scroll so the player stays `margin` cells from the view edge.
+        Returns True if the camera moved (the view needs a full redraw)."""
+        self._use(state)
+        if state.player is None:
+            return False
+        size = self.tile_size
+        cam = self.camera
+        px = state.player % state.width * size
+        py = state.player // state.width * size
+        mx = min(margin * size, max(0, (cam.w - size) // 2))
+        my = min(margin * size, max(0, (cam.h - size) // 2))
+        x, y = cam.topleft
+        if px - mx < x:
+            x = px - mx
+        elif px + size + mx > x + cam.w:
+            x = px + size + mx - cam.w
+        if py - my < y:
+            y = py - my
+        elif py + size + my > y + cam.h:
+            y = py + size + my - cam.h
+        x = max(0, min(x, state.width * size - cam.w))
+        y = max(0, min(y, state.height * size - cam.h))
+        if (x, y) == cam.topleft:
+            return False
+        cam.topleft = (x, y)
+        return True
+
+    def visible_cells(self, state, area=None):
+        """(x range, y range) of the cells overlapping `area` (screen pixels,
+        default the whole view)."""
+        size = self.tile_size
+        world = (area or pygame.Rect((0, 0), self.camera.size)).move(self.camera.topleft)
+        xs = range(max(0, world.left // size), min(state.width, (world.right - 1) // size + 1))
+        ys = range(max(0, world.top // size), min(state.height, (world.bottom - 1) // size + 1))
+        return xs, ys
+
+    # ----------------- Drawing -----------------
+    def cell_rect(self, state, i):
+        """Screen rect of cell i."""
+        size = self.tile_size
+        return pygame.Rect(i % state.width * size - self.camera.x,
+                           i // state.width * size - self.camera.y, size, size)
+
+    def cell_at(self, state, pos):
+        """Index of the cell under screen position `pos`, or None off the map."""
+        x = (pos[0] + self.camera.x) // self.tile_size
+        y = (pos[1] + self.camera.y) // self.tile_size
+        if 0 <= x < state.width and 0 <= y < state.height:
+            return y * state.width + x
+        return None
+
+    def draw_cell(self, screen, state, i):
+        rect = self.cell_rect(state, i)
+        tile = state.tile(i)
+        if tile in (EMPTY, WALL, TARGET):
+            x, y = i % state.width, i // state.width
+            chunk = self._chunk(state, x // CHUNK_TILES, y // CHUNK_TILES)
+            size = self.tile_size
+            local = pygame.Rect(x % CHUNK_TILES * size, y % CHUNK_TILES * size, size, size)
+            screen.blit(chunk, rect, local)
+        else:
+            screen.blit(self.tiles[tile], rect)
+        return rect
+
+    def draw_full(self, screen, state):
+        """Draw the whole view."""
+        self._use(state)
+        cam = self.camera
+        span = CHUNK_TILES * self.tile_size
+        for cy in range(cam.top // span, min(state.height * self.tile_size, cam.bottom - 1) // span + 1):
+            for cx in range(cam.left // span, min(state.width * self.tile_size, cam.right - 1) // span + 1):
+                screen.blit(self._chunk(state, cx, cy), (cx * span - cam.x, cy * span - cam.y))
+        # Only the moving pieces inside the view; the rest of the map is never visited
+        xs, ys = self.visible_cells(state)
+        boxes = state.boxes
+        for y in ys:
+            row = y * state.width
+            for i in range(row + xs.start, row + xs.stop):
+                if i in boxes:
+                    self.draw_cell(screen, state, i)
+        if state.player is not None and self._visible(state, state.player):
+            self.draw_cell(screen, state, state.player)
+        state.dirty.clear()
+
+    def _visible(self, state, i):
+        return self.camera.colliderect(self.cell_rect(state, i).move(self.camera.topleft))
+
+    def draw_dirty(self, screen, state):
+        """Redraw the cells changed since the last draw. Returns their rects."""
+        rects = [self.draw_cell(screen, state, i) for i in state.dirty if self._visible(state, i)]
+        state.dirty.clear()
+        return rects
+
+    def draw_area(self, screen, state, area):
+        """Redraw every cell that overlaps `area` (e.g. under old HUD text)."""
+        xs, ys = self.visible_cells(state, area)
+        for y in ys:
+            for x in xs:
+                self.draw_cell(screen, state, y * state.width + x)
+        return area
@@ -0,0 +1,150 @@
+"""Recorded solutions and headless replay verification.
+
+A solution is the exact list of moves a player made, packed 2 bits per move
+(UP=0, RIGHT=1, DOWN=2, LEFT=3, as in sokoban_state.DIRECTIONS) with the
+first move in the lowest bits of the first byte. The move count is stored
+next to it in the score row, so no length header is needed.
+
+verify() replays a solution on a fresh SokobanState with the game's own
+move() rules. audit() does that for every score in the store, batched
+across a process pool:
+
+    python replay.py audit [scores.db] [--workers N]
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from sokoban_state import SokobanState, DIRECTIONS
+from score_store import ScoreStore, SCORE_DB
+
+BATCH_SIZE = 2000
+
+
+# ----------------- Packing -----------------
+def pack_moves(directions):
+    out = bytearray()
+    byte = shift = 0
+    for d in directions:
+        byte |= d << shift
+        shift += 2
+        if shift == 8:
+            out.append(byte)
+            byte = shift = 0
+    if shift:
+        out.append(byte)
+    return bytes(out)
+
+
+def unpack_moves(data, count):
+    moves = []
+    for byte in data:
+        moves.extend((byte & 3, (byte >> 2) & 3, (byte >> 4) & 3, byte >> 6))
+    if len(moves) < count:
+        raise ValueError("solution shorter than its move count")
+    return moves[:count]
+
+
+# ----------------- Verification -----------------
+def verify(state, solution, moves):
+    """Replay `moves` packed moves on a copy of `state`.
+
+    Returns None if the replay is legal, uses every move and ends solved,
+    otherwise a short reason.
+    """
+    if solution is None:
+        return "no recording"
+    if len(solution) != (moves + 3) // 4:
+        return "length mismatch"
+    try:
+        directions = unpack_moves(solution, moves)
+    except ValueError as e:
+        return str(e)
+    board = state.copy()
+    for n, d in enumerate(directions):
+        if not board.move(*DIRECTIONS[d]):
+            return f"illegal move {n + 1}"
+        if board.is_solved() and n + 1 < moves:
+            return f"solved after {n + 1} moves"    # the game stops at the win
+    if not board.is_solved():
+        return "not solved"
+    return None
+
+
+def _verify_batch(grid, rows):
+    """Worker: verify (id, moves, solution) rows that share one level."""
+    state = SokobanState(grid)
+    return [(row_id, verify(state, solution, moves)) for row_id, moves, solution in rows]
+
+
+def _batches(store, batch_size):
+    """(grid, rows) batches, each limited to one level."""
+    grids = {}
+    pending = {}
+    for row_id, level, _, moves, solution in store.iter_scores():
+        if level not in grids:
+            grids[level] = store.level_grid(level)
+        rows = pending.setdefault(level, [])
+        rows.append((row_id, moves, solution))
+        if len(rows) >= batch_size:
+            yield level, grids[level], rows
+            pending[level] = []
+    for level, rows in pending.items():
+        if rows:
+            yield level, grids[level], rows
+
+
+def audit(store, workers=None, batch_size=BATCH_SIZE):
+    """Verify every score in the store. Returns {score id: reason} for the
+    ones that fail (an empty dict means the whole leaderboard checks out)."""
+    workers = workers or os.cpu_count() or 1
+    failures = {}
+    batches = _batches(store, batch_size)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep a bounded number of batches in flight so a big leaderboard isn't read up front
+        window = 2 * workers
+        running = set()
+        exhausted = False
+        while running or not exhausted:
+            while not exhausted and len(running) < window:
+                item = next(batches, None)
+                if item is None:
+                    exhausted = True
+                    break
+                level, grid, rows = item
+                if grid is None:
+                    failures.update((row_id, "unknown level") for row_id, _, _ in rows)
+                    continue
+                running.add(pool.submit(_verify_batch, grid, rows))
+            if not running:
+                break
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for row_id, reason in future.result():
+                    if reason is not None:
+                        failures[row_id] = reason
+    return failures
+
+
+def main(argv):
+    if not argv or argv[0] != "audit":
+        print(__doc__)
+        return 1
+    args = argv[1:]
+    workers = None
+    if "--workers" in args:
+        i = args.index("--workers")
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+    store = ScoreStore(args[0] if args else SCORE_DB)
+    total = store.count()
+    failures = audit(store, workers)
+    for row_id, reason in sorted(failures.items()):
+        print(f"score {row_id}: {reason}")
+    print(f"{total - len(failures)}/{total} scores verified")
+    return 0 if not failures else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,101 @@
+"""Adaptive frame pacing for the App loop.
+
+Instead of drawing 60 frames a second no matter what, the loop asks the
+scheduler for the next batch of events. The scheduler:
+
+- blocks in pygame.event.wait() while the scene is static, so an idle game
+  board costs no CPU until a key is pressed;
+- wakes at the scene's animation frame rate while something moves (the
+  falling background, a timer on the win screen), or earlier on input;
+- drops animations to UNFOCUSED_FPS when the window loses focus, and to
+  IDLE_FPS after IDLE_AFTER_MS without input (kiosks left alone all night);
+- never runs faster than max_fps, however many input events arrive.
+"""
+
+import math
+import time
+
+import pygame
+
+MAX_FPS = 60
+UNFOCUSED_FPS = 5
+IDLE_FPS = 10
+IDLE_AFTER_MS = 120_000
+STATIC_WAIT_MS = 1000   # a static scene still gets update() this often
+
+INPUT_EVENTS = (pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+                pygame.MOUSEMOTION, pygame.MOUSEWHEEL, pygame.TEXTINPUT)
+
+
+def _now_ms():
+    return time.perf_counter() * 1000
+
+
+class FrameScheduler:
+    def __init__(self, max_fps=MAX_FPS):
+        self.max_fps = max_fps
+        self.focused = True
+        self.last_input = _now_ms()
+        self.last_frame = 0.0
+        self.next_frame = 0.0     # when the next animation frame is due
+        self._woken = False
+
+    def wake(self):
+        """Make the next wait() return without blocking (e.g. a new scene)."""
+        self._woken = True
+
+    def frame_rate(self, scene_fps):
+        """The rate to animate at right now, or None if nothing animates."""
+        if not scene_fps:
+            return None
+        fps = min(scene_fps, self.max_fps)
+        if not self.focused:
+            fps = min(fps, UNFOCUSED_FPS)
+        elif _now_ms() - self.last_input >= IDLE_AFTER_MS:
+            fps = min(fps, IDLE_FPS)
+        return fps
+
+    def wait(self, scene_fps=None):
+        """Block until input arrives or the next animation frame is due.
+
+        `scene_fps` is the frame rate the scene wants (None when it is
+        static). Returns the events to handle, possibly none.
+        """
+        # Cap the frame rate, like Clock.tick() did
+        spare = self.last_frame + 1000 / self.max_fps - _now_ms()
+        if spare > 0:
+            time.sleep(spare / 1000)
+
+        fps = self.frame_rate(scene_fps)
+        events = pygame.event.get()
+        if self._woken:
+            self._woken = False
+        else:
+            deadline = _now_ms() + STATIC_WAIT_MS if fps is None else self.next_frame
+            # event.wait() can return a little early, so wait until the deadline
+            while not events:
+                timeout = deadline - _now_ms()
+                if timeout <= 0:
+                    break
+                event = pygame.event.wait(math.ceil(timeout))
+                if event.type != pygame.NOEVENT:
+                    events = [event] + pygame.event.get()
+
+        now = self.last_frame = _now_ms()
+        if fps is not None and now >= self.next_frame:
+            period = 1000 / fps
+            # Keep a steady cadence, but don't try to catch up after a stall
+            self.next_frame = self.next_frame + period if now - self.next_frame < period else now + period
+        for event in events:
+            self._note(event, now)
+        return events
+
+    def _note(self, event, now):
+        if event.type in INPUT_EVENTS:
+            self.last_input = now
+        elif event.type == pygame.WINDOWFOCUSLOST:
+            self.focused = False
+        elif event.type == pygame.WINDOWFOCUSGAINED:
+            self.focused = True
+            self.last_input = now
+            self.next_frame = now   # pick the animation back up straight away
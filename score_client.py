@@ -0,0 +1,297 @@
+"""Kiosk side of the shared leaderboard (see score_server.py).
+
+    python score_client.py --bench [submissions] [--url URL] [--kiosks 8]
+
+submit() never waits for the network: the score joins an offline queue
+that is saved to QUEUE_FILE (through persistence.py) and a worker thread
+posts what is queued, up to BATCH_BYTES per request, over a kept-alive
+connection. A level's grid is queued once and sent with the first of its
+scores. If the server can't be reached (or answers 5xx) the queue stays
+on disk and is sent again every RETRY_SECONDS, and on the next start.
+Every score carries its own id, so a batch that reached the server before
+the connection dropped is not counted twice when it is resent. Scores the
+server refuses (4xx) are moved to REJECTED_FILE, so one bad score can't
+hold up the rest of the queue.
+
+--bench plays `kiosks` clients posting single scores to a running server
+and prints the submissions per second.
+"""
+
+import base64
+import http.client
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlencode
+
+from persistence import read_json, write_json
+from score_server import MAX_BODY
+
+SERVER_URL = "http://127.0.0.1:8765"
+QUEUE_FILE = "score_queue.json"
+REJECTED_FILE = "score_rejected.json"
+TIMEOUT = 2.0
+RETRY_SECONDS = 10.0
+BATCH_BYTES = 1024 * 1024   # request body size when replaying a long queue
+
+
+class ServerError(Exception):
+    """The server could not take the request now (5xx); try again later."""
+
+
+class Rejected(Exception):
+    """The server refused the request itself (4xx); sending it again won't help."""
+
+
+class ScoreClient:
+    def __init__(self, url=SERVER_URL, queue_file=QUEUE_FILE, timeout=TIMEOUT,
+                 rejected_file=REJECTED_FILE):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.queue_file = queue_file
+        self.rejected_file = rejected_file
+        self.timeout = timeout
+        self.sent = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._retry = None
+        self._closed = False
+        self._conn = None           # only used on the worker thread
+        self._sent_grids = set()    # levels the server has taken a grid for
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="score-client")
+        try:
+            saved = read_json(queue_file)
+        except (FileNotFoundError, ValueError):
+            saved = {}
+        if isinstance(saved, list):     # older queue files: grids inside the scores
+            saved = {"scores": saved, "grids": {}}
+            for record in saved["scores"]:
+                if "grid" in record:
+                    saved["grids"][record["level"]] = record.pop("grid")
+        self._queue = saved.get("scores", [])
+        self._grids = saved.get("grids", {})    # level -> grid, until the server has it
+        try:
+            self.rejected = read_json(rejected_file)
+        except (FileNotFoundError, ValueError):
+            self.rejected = []
+        if self._queue:
+            self._executor.submit(self._send_pending)
+
+    # ----------------- Connection -----------------
+    def _request(self, method, path, body=None):
+        """Send one request on the kept-alive connection; returns the JSON reply.
+        A connection the server has closed is reopened once. Raises ServerError
+        or Rejected for an error status."""
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in (0, 1):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body, headers)
+                response = self._conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                self._conn.close()
+                self._conn = None
+            try:
+                reply = json.loads(data)
+            except ValueError:
+                reply = {}
+            error = reply.get("error", response.reason) if isinstance(reply, dict) else ""
+            if 400 <= response.status < 500:
+                raise Rejected(f"{response.status} {error}")
+            if response.status != 200 or not isinstance(reply, dict):
+                raise ServerError(f"{response.status} {error}")
+            return reply
+
+    # ----------------- Submitting -----------------
+    def submit(self, level, user, moves, solution=None, grid=None):
+        """Queue a score for the server and return at once. The grid is sent
+        once per level, with the first of its scores."""
+        record = {"id": uuid.uuid4().hex, "level": level, "user": user, "moves": moves}
+        if solution is not None:
+            record["solution"] = base64.b64encode(solution).decode("ascii")
+        with self._lock:
+            if grid is not None and level not in self._sent_grids:
+                self._grids.setdefault(level, grid)
+            self._queue.append(record)
+            self._save()
+        self._executor.submit(self._send_pending)
+
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    def _save(self):
+        # Called with self._lock held
+        write_json(self.queue_file, {"scores": self._queue, "grids": self._grids}, indent=None)
+
+    def _next_batch(self, limit=None):
+        """(records, their JSON texts) for the next POST: as many queued
+        scores as fit in BATCH_BYTES (at least one), at most `limit`."""
+        records = []
+        texts = []
+        size = 2
+        with self._lock:
+            with_grid = set()
+            for record in self._queue:
+                if limit is not None and len(records) >= limit:
+                    break
+                level = record["level"]
+                if level in self._grids and level not in with_grid:
+                    record = dict(record, grid=self._grids[level])
+                    with_grid.add(level)
+                text = json.dumps(record, separators=(",", ":"))
+                if records and size + len(text) + 1 > BATCH_BYTES:
+                    break
+                records.append(record)
+                texts.append(text)
+                size += len(text) + 1
+        return records, texts
+
+    def _send_pending(self):
+        limit = None    # halved while the server refuses whole requests
+        while True:
+            batch, texts = self._next_batch(limit)
+            if not batch:
+                return
+            rejected = []
+            if len(texts[0]) + 2 > MAX_BODY and "grid" in batch[0]:
+                # The grid alone is too big to send; the scores still go without it
+                with self._lock:
+                    self._grids.pop(batch[0]["level"], None)
+                    self._save()
+                continue
+            try:
+                if len(texts[0]) + 2 > MAX_BODY:
+                    raise Rejected("score too large for the server")
+                reply = self._request("POST", "/scores", "[" + ",".join(texts) + "]")
+            except Rejected as exc:
+                if len(batch) > 1:
+                    limit = max(1, len(batch) // 2)     # find the score it objects to
+                    continue
+                rejected = [(batch[0], str(exc))]
+            except (OSError, http.client.HTTPException, ServerError) as exc:
+                self.last_error = exc
+                self._retry_later()
+                return
+            else:
+                for entry in reply.get("rejected", []):
+                    rejected.append((batch[entry["index"]], entry["error"]))
+                for record in batch:
+                    if "grid" in record and all(record is not r for r, _ in rejected):
+                        self._sent_grids.add(record["level"])
+            self.last_error = None
+            self._finish(batch, rejected)
+
+    def _finish(self, batch, rejected):
+        """Drop a batch the server has answered from the queue; the scores it
+        refused are kept in REJECTED_FILE instead of being sent again."""
+        done = {record["id"] for record in batch}
+        with self._lock:
+            self._queue = [r for r in self._queue if r["id"] not in done]
+            waiting = {r["level"] for r in self._queue}
+            for level in list(self._grids):
+                if level in self._sent_grids or level not in waiting:
+                    del self._grids[level]
+            self._save()
+            if rejected:
+                for record, error in rejected:
+                    record = {k: v for k, v in record.items() if k != "grid"}
+                    self.rejected.append({"score": record, "error": error})
+                    print(f"score rejected by the server: {error}", file=sys.stderr)
+                write_json(self.rejected_file, self.rejected)
+        self.sent += len(batch) - len(rejected)
+
+    def _retry_later(self):
+        with self._lock:
+            if self._closed or (self._retry is not None and self._retry.is_alive()):
+                return
+            self._retry = threading.Timer(RETRY_SECONDS, self._executor.submit, (self._send_pending,))
+            self._retry.daemon = True
+            self._retry.start()
+
+    # ----------------- Leaderboard -----------------
+    def leaderboard_async(self, level, k=5):
+        """Future of the server's top `k` for `level` ([{"user", "moves"}, ...]).
+        It raises if the server can't be reached."""
+        path = "/leaderboard?" + urlencode({"level": level, "k": k})
+        return self._executor.submit(lambda: self._request("GET", path)["scores"])
+
+    def close(self):
+        """Stop the worker; whatever is still queued stays in QUEUE_FILE."""
+        with self._lock:
+            self._closed = True
+            if self._retry is not None:
+                self._retry.cancel()
+        self._executor.shutdown(wait=True)
+        if self._conn is not None:
+            self._conn.close()
+
+
+# ----------------- Benchmark -----------------
+def bench(url=SERVER_URL, submissions=20_000, kiosks=8):
+    """Each kiosk thread posts single scores on its own connection."""
+    parts = urlsplit(url)
+    per_kiosk = submissions // kiosks
+    run = uuid.uuid4().hex[:8]
+    failures = []
+
+    def kiosk(n):
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+        try:
+            for i in range(per_kiosk):
+                body = json.dumps({"id": f"{run}-{n}-{i}", "level": f"bench-{i % 50}",
+                                   "user": f"kiosk{n}", "moves": 50 + (i * 7919) % 500})
+                conn.request("POST", "/scores", body, {"Content-Type": "application/json"})
+                conn.getresponse().read()
+        except (OSError, http.client.HTTPException) as exc:
+            failures.append(exc)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=kiosk, args=(n,)) for n in range(kiosks)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {"submissions": per_kiosk * kiosks, "kiosks": kiosks, "seconds": round(elapsed, 3),
+            "per_second": round(per_kiosk * kiosks / elapsed), "failed_kiosks": len(failures)}
+
+
+def main(argv):
+    args = list(argv)
+    options = {"--url": SERVER_URL, "--kiosks": "8"}
+    submissions = None
+    while args:
+        arg = args.pop(0)
+        if arg == "--bench":
+            submissions = 20_000
+            if args and args[0].isdigit():
+                submissions = int(args.pop(0))
+        elif arg in options and args:
+            options[arg] = args.pop(0)
+        else:
+            print(__doc__)
+            return 2
+    if submissions is None:
+        print(__doc__)
+        return 2
+    print(json.dumps(bench(options["--url"], submissions, int(options["--kiosks"])), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,234 @@
+"""Leaderboard server shared by several kiosks.
+
+    python score_server.py [--host 127.0.0.1] [--port 8765] [--db server_scores.db] [--top 10]
+
+A small HTTP/1.1 JSON service on asyncio; clients keep their connection
+open between requests (see score_client.py):
+
+    POST /scores        one score or a list of them:
+                        {"id": "<unique>", "level": "<level id>", "user": "ann",
+                         "moves": 97, "solution": "<base64>", "grid": [[...]]}
+                        "solution" and "grid" are optional; a grid must
+                        hash to its level id (score_store.level_id).
+                        Reply: {"accepted": 1, "duplicates": 0, "rejected":
+                        [{"index": 0, "id": "...", "error": "..."}, ...]}
+    GET  /leaderboard?level=<level id>&k=5
+                        {"level": "...", "scores": [{"user": "ann", "moves": 97}, ...]}
+    GET  /health
+
+Scores go into a ScoreStore with write_behind on: each submission is put
+into the level's in-memory top-K heap at once, and the write-behind thread
+inserts them in batches, one transaction each. Leaderboard queries are
+answered from the heaps. Clients resend their offline queue after an
+outage, so submission ids seen recently are remembered and repeats ignored.
+Each score in a batch is checked on its own: a bad one is listed under
+"rejected" and the rest are still taken, so one bad score can't hold up a
+kiosk's whole queue. A 4xx status means the request itself was bad.
+"""
+
+import asyncio
+import base64
+import binascii
+import json
+import signal
+import sys
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+
+from score_store import ScoreStore, level_id
+
+HOST = "127.0.0.1"
+PORT = 8765
+SERVER_DB = "server_scores.db"
+TOP_K = 10
+MAX_BODY = 4 * 1024 * 1024
+MAX_K = 100
+SEEN_IDS = 200_000      # submission ids remembered to drop resends
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large"}
+
+
+class BadRequest(Exception):
+    pass
+
+
+class ScoreServer:
+    def __init__(self, path=SERVER_DB, top_k=TOP_K):
+        self.store = ScoreStore(path, top_k=top_k, write_behind=True)
+        self.seen = OrderedDict()   # recent submission ids, oldest first
+        self.levels = set()         # levels whose grid has been stored
+        self.accepted = 0
+        self.duplicates = 0
+        self.clients = set()        # open connections' writers
+
+    def close(self):
+        self.store.close()
+
+    # ----------------- Requests -----------------
+    def parse(self, record):
+        """Check one submitted score; returns its fields or raises BadRequest."""
+        if not isinstance(record, dict):
+            raise BadRequest("a score must be an object")
+        level, user, moves = record.get("level"), record.get("user"), record.get("moves")
+        if not isinstance(level, str) or not isinstance(user, str) or not level or not user:
+            raise BadRequest("level and user must be non-empty strings")
+        if not isinstance(moves, int) or isinstance(moves, bool) or moves < 0:
+            raise BadRequest("moves must be a non-negative integer")
+        submission = record.get("id")
+        if submission is not None and not isinstance(submission, str):
+            raise BadRequest("id must be a string")
+        solution = record.get("solution")
+        if solution is not None:
+            try:
+                solution = base64.b64decode(solution, validate=True)
+            except (binascii.Error, TypeError):
+                raise BadRequest("solution must be base64") from None
+        grid = record.get("grid")
+        if grid is not None and level not in self.levels:
+            # Audits replay the level's scores on this grid, so it has to be the right one
+            if not isinstance(grid, list) or level_id(grid) != level:
+                raise BadRequest("grid does not match level")
+        return submission, level, user, moves, solution, grid
+
+    def add_score(self, fields):
+        """Store a parsed score. False if its id was already taken."""
+        submission, level, user, moves, solution, grid = fields
+        if submission is not None:
+            if submission in self.seen:
+                self.duplicates += 1
+                return False
+            self.seen[submission] = None
+            if len(self.seen) > SEEN_IDS:
+                self.seen.popitem(last=False)
+        if grid is not None and level not in self.levels:
+            self.store.add_level(level, grid)
+            self.levels.add(level)
+        self.store.add(level, user, moves, solution)
+        self.accepted += 1
+        return True
+
+    def route(self, method, target, body):
+        """(status, JSON-able reply) for one request."""
+        url = urlsplit(target)
+        if url.path == "/scores":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise BadRequest("body is not JSON") from None
+            records = data if isinstance(data, list) else [data]
+            added = 0
+            rejected = []
+            for index, record in enumerate(records):
+                try:
+                    added += self.add_score(self.parse(record))
+                except BadRequest as exc:
+                    submission = record.get("id") if isinstance(record, dict) else None
+                    rejected.append({"index": index, "id": submission, "error": str(exc)})
+            return 200, {"accepted": added, "duplicates": len(records) - added - len(rejected),
+                         "rejected": rejected}
+        if url.path == "/leaderboard":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            query = parse_qs(url.query)
+            level = query.get("level", [""])[0]
+            if not level:
+                raise BadRequest("level is required")
+            try:
+                k = max(1, min(MAX_K, int(query.get("k", ["5"])[0])))
+            except ValueError:
+                raise BadRequest("k must be an integer") from None
+            return 200, {"level": level, "scores": self.store.top(level, k)}
+        if url.path == "/health":
+            return 200, {"ok": True, "accepted": self.accepted, "duplicates": self.duplicates}
+        return 404, {"error": "not found"}
+
+    # ----------------- HTTP -----------------
+    async def handle(self, reader, writer):
+        self.clients.add(writer)
+        try:
+            while True:
+                # Request line and headers in one read, not one await per line
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split()
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:-2]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0") or 0)
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"error": "body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version != "HTTP/1.0")
+                try:
+                    status, reply = self.route(method, target, body)
+                except BadRequest as exc:
+                    status, reply = 400, {"error": str(exc)}
+                await self.respond(writer, status, reply, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def respond(self, writer, status, reply, keep_alive):
+        data = json.dumps(reply).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+        await writer.drain()
+
+
+async def serve(host=HOST, port=PORT, path=SERVER_DB, top_k=TOP_K):
+    server = ScoreServer(path, top_k)
+    listener = await asyncio.start_server(server.handle, host, port)
+    stop = asyncio.Event()
+    try:
+        # A plain kill stops the server like Ctrl+C, so queued inserts are committed
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    except NotImplementedError:
+        pass    # Windows
+    print(f"Scores on http://{host}:{port} ({path})", file=sys.stderr)
+    try:
+        async with listener:
+            await stop.wait()
+            # Hang up on idle kiosks so their handlers finish
+            for writer in list(server.clients):
+                writer.close()
+            await asyncio.sleep(0.1)
+    finally:
+        server.close()
+
+
+def main(argv):
+    args = list(argv)
+    options = {"--host": HOST, "--port": str(PORT), "--db": SERVER_DB, "--top": str(TOP_K)}
+    while args:
+        arg = args.pop(0)
+        if arg in options and args:
+            options[arg] = args.pop(0)
+        else:
+            print(__doc__)
+            return 2
+    try:
+        asyncio.run(serve(options["--host"], int(options["--port"]), options["--db"],
+                          int(options["--top"])))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
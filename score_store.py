@@ -0,0 +1,236 @@
+"""Score storage: SQLite with an index on (level, moves).
+
+Scores are kept per level (a level is identified by a hash of its grid), so
+saving a new level no longer throws the old scores away. For every level
+that has been asked for, the store keeps the best TOP_K scores in a heap
+that each insert updates, so the leaderboard never re-sorts anything.
+
+Each score can carry its recorded solution (see replay.py) and the store
+keeps a copy of every level grid it has scores for, so the leaderboard
+can be audited by replaying the solutions.
+
+With write_behind=True (the game's store) add() and add_level() return at
+once: the rows go to the leaderboard heaps straight away and are inserted
+by the write-behind thread (persistence.py) over its own connection, one
+transaction per batch. Until then they are merged into every read.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import sqlite3
+import threading
+
+from persistence import writer
+
+SCORE_DB = "scores.db"
+LEGACY_SCORES_FILE = "scores.json"
+TOP_K = 5
+
+
+def level_id(grid):
+    """Stable id for a level grid: same tiles, same id."""
+    data = json.dumps(grid, separators=(",", ":")).encode()
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+class ScoreStore:
+    def __init__(self, path=SCORE_DB, top_k=TOP_K, write_behind=False):
+        self.path = path
+        self.top_k = top_k
+        self.write_behind = write_behind
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " id INTEGER PRIMARY KEY,"
+            " level TEXT NOT NULL,"
+            " user TEXT NOT NULL,"
+            " moves INTEGER NOT NULL,"
+            " solution BLOB)"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(scores)")]
+        if "solution" not in columns:   # stores created before moves were recorded
+            self.conn.execute("ALTER TABLE scores ADD COLUMN solution BLOB")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS scores_level_moves ON scores (level, moves)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS levels (level TEXT PRIMARY KEY, grid TEXT NOT NULL)")
+        self.conn.commit()
+        # level -> max-heap (as negatives) of the best top_k: (-moves, -id, user)
+        self._top = {}
+        # Write-behind: rows queued but not committed, by the id they will get
+        self._lock = threading.Lock()
+        self._unsaved = {}
+        self._unsaved_levels = {}
+        self._next_id = None
+        self._writer_conn = None
+
+    def close(self):
+        if self.write_behind:
+            writer().flush()
+            if self._writer_conn is not None:
+                self._writer_conn.close()
+        self.conn.close()
+
+    def _load_top(self, level):
+        # Snapshot the queue first: a row committed after this is found twice, never missed
+        with self._lock:
+            unsaved = [(row_id, row) for row_id, row in self._unsaved.items() if row[0] == level]
+        rows = self.conn.execute(
+            "SELECT id, user, moves FROM scores WHERE level = ?"
+            " ORDER BY moves, id LIMIT ?", (level, self.top_k)).fetchall()
+        heap = [(-moves, -row_id, user) for row_id, user, moves in rows]
+        heapq.heapify(heap)
+        saved = {row[0] for row in rows}
+        for row_id, (_, user, moves, _) in unsaved:
+            if row_id not in saved:
+                self._offer(heap, (-moves, -row_id, user))
+        self._top[level] = heap
+        return heap
+
+    def _offer(self, heap, entry):
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:   # fewer moves (or same moves, earlier) than the worst kept
+            heapq.heapreplace(heap, entry)
+
+    def add_level(self, level, grid):
+        """Remember the grid a level id stands for (kept for audits)."""
+        row = (level, json.dumps(grid, separators=(",", ":")))
+        if self.write_behind:
+            with self._lock:
+                self._unsaved_levels[level] = row[1]
+            writer().submit(("levels", self.path), self._commit_levels, row)
+            return
+        self.conn.execute("INSERT OR IGNORE INTO levels (level, grid) VALUES (?, ?)", row)
+        self.conn.commit()
+
+    def level_grid(self, level):
+        with self._lock:
+            text = self._unsaved_levels.get(level)
+        if text is None:
+            row = self.conn.execute("SELECT grid FROM levels WHERE level = ?", (level,)).fetchone()
+            text = row[0] if row else None
+        return json.loads(text) if text is not None else None
+
+    def add(self, level, user, moves, solution=None):
+        """Save a score; returns its row id."""
+        if self.write_behind:
+            return self._add_later(level, user, moves, solution)
+        cursor = self.conn.execute(
+            "INSERT INTO scores (level, user, moves, solution) VALUES (?, ?, ?, ?)",
+            (level, user, moves, solution))
+        self.conn.commit()
+        heap = self._top.get(level)
+        if heap is not None:
+            self._offer(heap, (-moves, -cursor.lastrowid, user))
+        return cursor.lastrowid
+
+    def _add_later(self, level, user, moves, solution):
+        with self._lock:
+            if self._next_id is None:
+                self._next_id = self.conn.execute(
+                    "SELECT COALESCE(MAX(id), 0) + 1 FROM scores").fetchone()[0]
+            row_id = self._next_id
+            self._next_id += 1
+            self._unsaved[row_id] = (level, user, moves, solution)
+        heap = self._top.get(level)
+        if heap is not None:
+            self._offer(heap, (-moves, -row_id, user))
+        writer().submit(("scores", self.path), self._commit_scores, row_id)
+        return row_id
+
+    # ----------------- Writer thread -----------------
+    def _writer_connection(self):
+        if self._writer_conn is None:
+            # Only the writer thread uses it; close() runs after the last flush
+            self._writer_conn = sqlite3.connect(self.path, check_same_thread=False)
+        return self._writer_conn
+
+    def _commit_scores(self, ids):
+        with self._lock:
+            rows = [(row_id, *self._unsaved[row_id]) for row_id in ids]
+        conn = self._writer_connection()
+        try:
+            with conn:
+                conn.executemany("INSERT INTO scores (id, level, user, moves, solution)"
+                                 " VALUES (?, ?, ?, ?, ?)", rows)
+        except sqlite3.IntegrityError:
+            # Another instance sharing the database took some of these ids
+            with conn:
+                for row in rows:
+                    try:
+                        conn.execute("INSERT INTO scores (id, level, user, moves, solution)"
+                                     " VALUES (?, ?, ?, ?, ?)", row)
+                    except sqlite3.IntegrityError:
+                        conn.execute("INSERT INTO scores (level, user, moves, solution)"
+                                     " VALUES (?, ?, ?, ?)", row[1:])
+        with self._lock:
+            for row_id in ids:
+                del self._unsaved[row_id]
+
+    def _commit_levels(self, rows):
+        conn = self._writer_connection()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO levels (level, grid) VALUES (?, ?)", rows)
+        with self._lock:
+            for level, _ in rows:
+                self._unsaved_levels.pop(level, None)
+
+    def add_many(self, rows):
+        """Bulk insert of (level, user, moves) rows in one transaction."""
+        rows = list(rows)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO scores (level, user, moves) VALUES (?, ?, ?)", rows)
+        # Cached heaps are cheaper to rebuild from the index than to patch
+        for level in {row[0] for row in rows}:
+            self._top.pop(level, None)
+
+    def top(self, level, k=None):
+        """Best scores for a level, fewest moves first."""
+        heap = self._top.get(level)
+        if heap is None:
+            heap = self._load_top(level)
+        best = sorted(heap, reverse=True)
+        return [{"user": user, "moves": -moves} for moves, _, user in best[:k]]
+
+    def iter_scores(self, level=None, batch=10_000):
+        """Yield (id, level, user, moves, solution) rows, batch by batch.
+        Only committed rows: call persistence.flush() first to include queued ones."""
+        query = "SELECT id, level, user, moves, solution FROM scores"
+        args = ()
+        if level is not None:
+            query += " WHERE level = ?"
+            args = (level,)
+        cursor = self.conn.execute(query, args)
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                return
+            yield from rows
+
+    def count(self, level=None):
+        if level is None:
+            return self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM scores WHERE level = ?", (level,)).fetchone()[0]
+
+
+def open_store(path=SCORE_DB, legacy_level=None, legacy_file=LEGACY_SCORES_FILE,
+               write_behind=False):
+    """Open the score store. The first time, scores from the old scores.json
+    are imported under `legacy_level` (the level they were played on)."""
+    new = not os.path.exists(path)
+    store = ScoreStore(path, write_behind=write_behind)
+    if new and legacy_level is not None and os.path.exists(legacy_file):
+        with open(legacy_file, "r") as f:
+            try:
+                scores = json.load(f)
+            except json.JSONDecodeError:
+                scores = []
+        store.add_many((legacy_level, s["user"], s["moves"]) for s in scores)
+    return store
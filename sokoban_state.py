@@ -0,0 +1,214 @@
+"""Headless Sokoban engine.
+
+No pygame in here: the game, the puzzle editor and any tooling all drive the
+same SokobanState, so the rules live in exactly one place.
+
+Cells are stored by flat index (y * width + x). The player position, the set
+of boxes and the number of unfilled targets are kept up to date as things
+change, so move(), undo() and is_solved() cost the same on any map size.
+
+Every move is logged as one byte (direction in bits 0-1, bit 2 set if it
+pushed a block), so undo/redo never copy the board and a 100k-move session
+costs about 100 KB. The log doubles as the recorded solution.
+"""
+
+# Level legend (same numbers as levels.json):
+EMPTY = 0
+WALL = 1
+PLAYER = 2
+BLOCK = 3
+TARGET = 4
+BLOCK_ON_TARGET = 5
+PLAYER_ON_TARGET = 6
+
+# Move directions, in the order used to encode recorded moves
+UP, RIGHT, DOWN, LEFT = range(4)
+DIRECTIONS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+_DIRECTION_INDEX = {d: i for i, d in enumerate(DIRECTIONS)}
+
+PUSHED = 4      # history flag: the move pushed a block
+
+
+class SokobanState:
+    def __init__(self, grid):
+        self.height = len(grid)
+        self.width = max((len(row) for row in grid), default=0)
+        size = self.width * self.height
+
+        self.walls = bytearray(size)
+        self.targets = bytearray(size)
+        self.boxes = set()
+        self.player = None
+        self.unfilled = 0       # targets with neither a box nor the player on them
+        self.history = bytearray()  # one byte per move, see PUSHED
+        self.redo_log = bytearray() # undone moves, most recent last
+        self.dirty = set()      # cells changed since a renderer last drew them
+
+        for y in range(self.height):
+            row = grid[y]
+            for x in range(self.width):
+                # Ragged rows are padded with wall so nothing walks off the map
+                self._place(y * self.width + x, row[x] if x < len(row) else WALL)
+
+    @classmethod
+    def empty(cls, width, height):
+        return cls([[EMPTY] * width for _ in range(height)])
+
+    def copy(self):
+        other = SokobanState.__new__(SokobanState)
+        other.width = self.width
+        other.height = self.height
+        other.walls = bytearray(self.walls)
+        other.targets = bytearray(self.targets)
+        other.boxes = set(self.boxes)
+        other.player = self.player
+        other.unfilled = self.unfilled
+        other.history = bytearray(self.history)
+        other.redo_log = bytearray(self.redo_log)
+        other.dirty = set()
+        return other
+
+    # ----------------- Tiles -----------------
+    def _place(self, i, tile):
+        if tile == WALL:
+            self.walls[i] = 1
+            return
+        if tile in (TARGET, BLOCK_ON_TARGET, PLAYER_ON_TARGET):
+            self.targets[i] = 1
+            if tile == TARGET:
+                self.unfilled += 1
+        if tile in (BLOCK, BLOCK_ON_TARGET):
+            self.boxes.add(i)
+        elif tile in (PLAYER, PLAYER_ON_TARGET):
+            # Only one player: an earlier one is taken off the map
+            if self.player is not None and self.targets[self.player]:
+                self.unfilled += 1
+            self.player = i
+
+    def _clear(self, i):
+        if self.targets[i] and i not in self.boxes and i != self.player:
+            self.unfilled -= 1
+        self.walls[i] = 0
+        self.targets[i] = 0
+        self.boxes.discard(i)
+        if self.player == i:
+            self.player = None
+
+    def tile(self, i):
+        if self.walls[i]:
+            return WALL
+        if i in self.boxes:
+            return BLOCK_ON_TARGET if self.targets[i] else BLOCK
+        if i == self.player:
+            return PLAYER_ON_TARGET if self.targets[i] else PLAYER
+        return TARGET if self.targets[i] else EMPTY
+
+    def tile_at(self, x, y):
+        return self.tile(y * self.width + x)
+
+    def set_tile(self, x, y, tile):
+        """Editor-style placement. Placing a player moves the existing one."""
+        i = y * self.width + x
+        if self.player is not None:
+            self.dirty.add(self.player)
+        self._clear(i)
+        self._place(i, tile)
+        self.dirty.add(i)
+
+    def to_grid(self):
+        return [[self.tile(y * self.width + x) for x in range(self.width)]
+                for y in range(self.height)]
+
+    def player_pos(self):
+        if self.player is None:
+            return None
+        return self.player % self.width, self.player // self.width
+
+    # ----------------- Rules -----------------
+    def _neighbour(self, i, dx, dy):
+        """Index of the cell next to i, or None if it is off the map."""
+        x = i % self.width + dx
+        y = i // self.width + dy
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def move(self, dx, dy):
+        """Step the player; push one block if it is in the way. True if moved."""
+        if not self._step(_DIRECTION_INDEX[(dx, dy)]):
+            return False
+        del self.redo_log[:]    # a new move ends the redo chain
+        return True
+
+    def _step(self, direction):
+        if self.player is None:
+            return False
+        dx, dy = DIRECTIONS[direction]
+        x = self.player
+        target = self._neighbour(x, dx, dy)
+        if target is None or self.walls[target]:
+            return False
+
+        pushed = target in self.boxes
+        if pushed:
+            beyond = self._neighbour(target, dx, dy)
+            if beyond is None or self.walls[beyond] or beyond in self.boxes:
+                return False  # block can't move
+            self.boxes.remove(target)
+            self.boxes.add(beyond)
+            self.dirty.add(beyond)
+            if self.targets[beyond]:
+                self.unfilled -= 1
+        elif self.targets[target]:
+            self.unfilled -= 1
+
+        if self.targets[x]:
+            self.unfilled += 1
+        self.player = target
+        self.dirty.add(x)
+        self.dirty.add(target)
+        self.history.append(direction | PUSHED if pushed else direction)
+        return True
+
+    def undo(self):
+        """Take back the last move (and its push, if any). True if undone."""
+        if not self.history:
+            return False
+        entry = self.history.pop()
+        dx, dy = DIRECTIONS[entry & 3]
+        current = self.player
+        previous = self._neighbour(current, -dx, -dy)
+
+        if self.targets[previous]:
+            self.unfilled -= 1
+        if entry & PUSHED:
+            beyond = self._neighbour(current, dx, dy)
+            self.boxes.remove(beyond)
+            self.boxes.add(current)
+            self.dirty.add(beyond)
+            if self.targets[beyond]:
+                self.unfilled += 1
+        elif self.targets[current]:
+            self.unfilled += 1
+        self.player = previous
+        self.dirty.add(current)
+        self.dirty.add(previous)
+        self.redo_log.append(entry)
+        return True
+
+    def redo(self):
+        """Replay the last undone move. True if there was one."""
+        if not self.redo_log:
+            return False
+        return self._step(self.redo_log.pop() & 3)
+
+    def move_count(self):
+        return len(self.history)
+
+    def directions(self):
+        """The moves made so far, as direction indices (the recorded solution)."""
+        return [entry & 3 for entry in self.history]
+
+    def is_solved(self):
+        # Same rule as check_win(): no target left showing as empty
+        return self.unfilled == 0
@@ -0,0 +1,260 @@
+"""Solve many levels in parallel and stream the results as JSON Lines.
+
+    python solve_pack.py [options] LEVELS...
+
+LEVELS are levels.json-style files (one grid or a list of grids), .xsb
+text or .skp packs. Each level is solved in a worker process with its own
+limits, and one JSON object per level is appended to the output as soon as
+it finishes:
+
+    {"file": "pack.skp", "index": 12, "title": "", "level": "<id>",
+     "status": "solved", "pushes": 31, "moves": 97, "nodes": 18211,
+     "time": 0.84, "solution": "rrdL..."}
+
+"pushes" is optimal (the solver searches over pushes); "moves" is the
+length of that solution. Levels already in the output file are skipped,
+so an interrupted run picks up where it stopped.
+
+When a worker dies (the memory cap or the OOM killer ending the process)
+the pool is restarted and every level that was in flight is sent again,
+in parallel. A level that is in flight for a second crash is run on its
+own, and gets a "crashed" record if it kills that worker too.
+
+Options:
+    -o FILE          output (default solutions.jsonl)
+    --workers N      worker processes (default: CPU count)
+    --time S         seconds per level (default 10)
+    --nodes N        node budget per level (default 1000000)
+    --memory MB      memory per worker process (default 1024)
+    --algorithm A    astar or idastar
+"""
+
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from level_pack import iter_levels
+from solver import solve, SOLVED
+
+OUTPUT_FILE = "solutions.jsonl"
+TIME_LIMIT = 10.0
+MAX_NODES = 1_000_000
+MEMORY_MB = 1024
+TABLE_BYTES_PER_ENTRY = 150     # rough cost of a transposition entry or a stored search node
+MEMORY_STATUS = "memory"        # the level hit the worker's memory limit
+CRASHED_STATUS = "crashed"      # the worker process died solving the level
+
+try:
+    import resource
+except ImportError:     # Windows: only the transposition table cap applies
+    resource = None
+
+
+# ----------------- Worker -----------------
+def _address_space():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _init_worker(memory_mb):
+    """Cap this worker's address space at what it uses now plus `memory_mb`."""
+    if resource is None:
+        return
+    used = _address_space()
+    if used is None:
+        return
+    limit = used + memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def solve_level(grid, time_limit=TIME_LIMIT, max_nodes=MAX_NODES, memory_mb=MEMORY_MB,
+                algorithm="astar"):
+    """Solve one level; returns the result fields of its JSONL record."""
+    started = time.perf_counter()
+    table_size = max(10_000, memory_mb * 1024 * 1024 // TABLE_BYTES_PER_ENTRY)
+    try:
+        result = solve(grid, algorithm, max_nodes=max_nodes, time_limit=time_limit,
+                       max_table_size=table_size)
+    except MemoryError:
+        return {"status": MEMORY_STATUS, "pushes": None, "moves": None, "nodes": None,
+                "time": round(time.perf_counter() - started, 3), "solution": None}
+    record = {
+        "status": result.status,
+        "pushes": result.pushes if result.status == SOLVED else None,
+        "moves": len(result.moves) if result.status == SOLVED else None,
+        "nodes": result.stats.nodes_expanded,
+        "time": round(result.stats.elapsed, 3),
+        "solution": result.lurd() if result.status == SOLVED else None,
+    }
+    if result.reason:
+        record["reason"] = result.reason
+    return record
+
+
+# ----------------- Resume -----------------
+def load_done(path):
+    """Keys of the levels already in `path`. A line cut off by an
+    interrupted write is removed so appending starts on a clean line."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue
+        done.add((row["file"], row["index"]))
+    return done
+
+
+def pending_levels(paths, done):
+    for path in paths:
+        for index, (title, grid) in enumerate(iter_levels(path)):
+            if (path, index) not in done:
+                yield path, index, title, grid
+
+
+# ----------------- Driver -----------------
+def _pool(workers, memory_mb):
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(memory_mb,))
+
+
+def run(paths, output=OUTPUT_FILE, workers=None, time_limit=TIME_LIMIT, max_nodes=MAX_NODES,
+        memory_mb=MEMORY_MB, algorithm="astar", progress=None):
+    """Solve every level not yet in `output`; returns {status: count} for this run."""
+    from score_store import level_id
+
+    done = load_done(output)
+    workers = workers or os.cpu_count() or 1
+    counts = {}
+    levels = pending_levels(paths, done)
+    retry = deque()         # levels in flight when a worker died, sent again first
+    suspects = deque()      # in flight for two crashes: run alone
+    crashes = {}            # (file, index) -> crashes the level was in flight for
+    pool = _pool(workers, memory_mb)
+    try:
+        with open(output, "a") as out:
+            def finish(record):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+                if progress is not None:
+                    progress(record)
+
+            # Keep a bounded number of levels in flight so huge packs aren't read up front
+            window = 4 * workers
+            running = {}        # future -> (level item, record, alone in the pool)
+            exhausted = False
+            while running or retry or suspects or not exhausted:
+                batch = []
+                if suspects:
+                    # Alone, a level that kills its worker can't be mistaken for its neighbours
+                    if not running:
+                        batch.append((suspects.popleft(), True))
+                else:
+                    while len(running) + len(batch) < window:
+                        if retry:
+                            item = retry.popleft()
+                        elif not exhausted:
+                            item = next(levels, None)
+                            if item is None:
+                                exhausted = True
+                                break
+                        else:
+                            break
+                        batch.append((item, False))
+                for item, alone in batch:
+                    path, index, title, grid = item
+                    future = pool.submit(solve_level, grid, time_limit, max_nodes, memory_mb,
+                                         algorithm)
+                    running[future] = (item, {"file": path, "index": index, "title": title,
+                                              "level": level_id(grid)}, alone)
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = []
+                for future in finished:
+                    item, record, alone = running.pop(future)
+                    try:
+                        record.update(future.result())
+                    except BrokenProcessPool:
+                        if not alone:
+                            broken.append(item)
+                            continue
+                        record.update({"status": CRASHED_STATUS, "pushes": None, "moves": None,
+                                       "nodes": None, "time": None, "solution": None,
+                                       "reason": "worker process died"})
+                        broken.append(None)
+                    finish(record)
+                if broken:
+                    # Everything still running went down with the pool
+                    for future, (item, record, alone) in running.items():
+                        if future.done() and future.exception() is None:
+                            record.update(future.result())
+                            finish(record)
+                        else:
+                            broken.append(item)
+                    running.clear()
+                    for item in broken:
+                        if item is None:
+                            continue
+                        key = (item[0], item[1])
+                        crashes[key] = crashes.get(key, 0) + 1
+                        (suspects if crashes[key] > 1 else retry).append(item)
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    pool = _pool(workers, memory_mb)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return counts
+
+
+def main(argv):
+    args = list(argv)
+    options = {"-o": OUTPUT_FILE, "--workers": None, "--time": TIME_LIMIT, "--nodes": MAX_NODES,
+               "--memory": MEMORY_MB, "--algorithm": "astar"}
+    paths = []
+    while args:
+        arg = args.pop(0)
+        if arg in options and args:
+            options[arg] = args.pop(0)
+        elif arg.startswith("-"):
+            print(__doc__)
+            return 2
+        else:
+            paths.append(arg)
+    if not paths:
+        print(__doc__)
+        return 2
+
+    def progress(record):
+        print(f"{record['file']}[{record['index']}]: {record['status']}"
+              + (f" in {record['pushes']} pushes" if record["pushes"] is not None else "")
+              + f" ({record['time']} s)", file=sys.stderr)
+
+    workers = options["--workers"]
+    counts = run(paths, options["-o"], int(workers) if workers else None,
+                 float(options["--time"]), int(options["--nodes"]), int(options["--memory"]),
+                 options["--algorithm"], progress)
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items())) or "nothing to do"
+    print(f"{summary} -> {options['-o']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,454 @@
+"""Sokoban solver.
+
+Searches over box pushes (the player's walking between pushes is free), so
+a found solution has the fewest possible pushes. Works on the grid format
+from levels.json:
+
+    result = solve(grid, time_limit=5)
+    if result.status == SOLVED:
+        print(result.pushes, result.lurd())
+
+Search:
+* A* (default) or IDA* (algorithm="idastar", much less memory).
+* Heuristic: sum over boxes of the push distance to the nearest target,
+  ignoring other boxes, updated in O(1) per push. check_win() also accepts
+  the player standing on the last free target, so when there are as many
+  boxes as targets the lost box (see below), or else the farthest one, is
+  left out to keep it admissible.
+* Boxes are an int bitset, as in board.Board, and the area the player can
+  reach is flood-filled over bitsets too. States are keyed by a 64-bit
+  Zobrist hash of the boxes plus the normalized player position (top-left
+  cell of the area it can reach).
+* A* keeps each generated node as a row of compact arrays (boxes, player,
+  parent index, push) and its open list is a heap of plain ints. The
+  transposition table and the stored nodes together hold at most
+  `max_table_size` entries: the table drops its oldest half when they are
+  over, and the search stops with LIMIT once the nodes alone are.
+* Pushes onto static dead squares and pushes that freeze a box off a
+  target are pruned, except for the one box that may stay off target when
+  there are as many boxes as targets (that box is "lost" and the others
+  must all reach a target).
+"""
+
+import heapq
+import time
+from array import array
+from itertools import islice
+
+from board import bit_cells, zobrist_table
+from deadlock import (UNREACHABLE, neighbour_table, pull_distances, frozen_deadlock, is_frozen,
+                      spare_boxes)
+from sokoban_state import SokobanState
+
+SOLVED = "solved"
+UNSOLVABLE = "unsolvable"
+LIMIT = "limit"           # ran out of nodes or time before deciding
+INVALID = "invalid"       # no player, or box and target counts that can never match
+
+MOVE_LETTERS = "urdl"     # same order as sokoban_state.DIRECTIONS
+
+
+class SolverStats:
+    def __init__(self):
+        self.nodes_expanded = 0
+        self.nodes_generated = 0
+        self.peak_table_size = 0
+        self.evictions = 0
+        self.elapsed = 0.0
+
+    @property
+    def nodes_per_sec(self):
+        return self.nodes_expanded / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "nodes_expanded": self.nodes_expanded,
+            "nodes_generated": self.nodes_generated,
+            "nodes_per_sec": round(self.nodes_per_sec),
+            "peak_table_size": self.peak_table_size,
+            "evictions": self.evictions,
+            "elapsed": round(self.elapsed, 4),
+        }
+
+
+class SolveResult:
+    def __init__(self, status, moves=None, pushes=None, stats=None, reason=""):
+        self.status = status
+        self.moves = moves          # list of direction indices, or None
+        self.pushed = None          # per move: True if it pushed a box
+        self.pushes = pushes
+        self.stats = stats or SolverStats()
+        self.reason = reason
+
+    @property
+    def solved(self):
+        return self.status == SOLVED
+
+    def lurd(self):
+        """Solution in LURD notation: lowercase walks, uppercase pushes."""
+        if self.moves is None:
+            return None
+        return "".join(MOVE_LETTERS[d].upper() if pushed else MOVE_LETTERS[d]
+                       for d, pushed in zip(self.moves, self.pushed))
+
+
+# Heap entries of the A* open list: f, h and the node index in one int
+_INDEX_BITS = 40
+_H_BITS = 20
+_INDEX_MASK = (1 << _INDEX_BITS) - 1
+_H_MASK = (1 << _H_BITS) - 1
+
+
+# ----------------- Search -----------------
+class _Search:
+    def __init__(self, grid, max_nodes, time_limit, max_table_size):
+        start = SokobanState(grid)
+        self.start = start
+        self.width = start.width
+        cells = start.width * start.height
+        self.walls = start.walls
+        self.targets = start.targets
+        self.target_list = [i for i in range(cells) if start.targets[i]]
+        # One box may end off-target if the player can cover the last target
+        self.spare_box = len(start.boxes) == len(self.target_list)
+        self.neighbours = neighbour_table(start.width, start.height)
+        self.dist = pull_distances(start.width, start.height, start.walls,
+                                   start.targets, self.neighbours)
+        self.dead = bytearray(1 if d == UNREACHABLE else 0 for d in self.dist)
+        # Heuristic cost per cell; a box that can't reach a target must be the lost one
+        self.cost = [max(d, 0) for d in self.dist]
+        # 0 or 1: solve() turns away levels with more boxes than targets
+        self.max_lost = spare_boxes(len(start.boxes), len(self.target_list))
+        # Frozen checks treat a pair of dead squares as a wall, which only
+        # holds while no box may be pushed onto one
+        self.freeze_dead = bytearray(cells) if self.spare_box else self.dead
+        self.target_bits = sum(1 << t for t in self.target_list)
+        # Flood fill masks: the floor, and the cells a step right or left may land on
+        self.floor_bits = sum(1 << i for i in range(cells) if not start.walls[i])
+        self.from_left = sum(1 << i for i in range(cells) if i % start.width)
+        self.from_right = sum(1 << i for i in range(cells) if i % start.width != start.width - 1)
+        table = zobrist_table(cells)
+        self.box_keys = table[:cells]
+        self.player_keys = table[cells:]
+
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.max_table_size = max_table_size
+        self.stats = SolverStats()
+        self.table = {}
+        self.stored = 0         # A* nodes kept for the open list and the solution
+        self.deadline = None
+        self.reason = ""
+
+    # ----------------- Helpers -----------------
+    def reach(self, player, boxes):
+        """Bitset of the cells the player can walk to, and the smallest of them."""
+        free = self.floor_bits & ~boxes
+        from_left = self.from_left
+        from_right = self.from_right
+        width = self.width
+        area = 1 << player
+        while True:
+            grown = (area | (area << 1) & from_left | (area >> 1) & from_right
+                     | area << width | area >> width) & free
+            if grown == area:
+                return area, (area & -area).bit_length() - 1
+            area = grown
+
+    def goal(self, boxes, on_target, area):
+        """Solved, with the same rule as check_win(). Returns the cell the
+        player still has to walk to (or -1), or None if not solved."""
+        missing = len(self.target_list) - on_target
+        if missing == 0:
+            return -1
+        if missing == 1:
+            for t in self.target_list:
+                if not boxes >> t & 1 and area >> t & 1:
+                    return t
+        return None
+
+    def children(self, boxes, area, h, lost):
+        """(new boxes, new h, new lost, box, direction, estimate) for every push;
+        estimate is bound() of the new position. `lost` is the cell of the box
+        allowed to stay off target, or -1."""
+        neighbours = self.neighbours
+        walls = self.walls
+        cost = self.cost
+        targets = self.targets
+        dead = self.dead
+        freeze_dead = self.freeze_dead
+        max_lost = self.max_lost
+        spare_box = self.spare_box
+        cells = list(bit_cells(boxes))
+        # One set per node, moved in place for each push, for the frozen checks
+        box_set = set(cells)
+        for box in cells:
+            around = neighbours[box]
+            for d in range(4):
+                behind = around[(d + 2) % 4]
+                if behind < 0 or not area >> behind & 1:
+                    continue
+                dst = around[d]
+                if dst < 0 or walls[dst] or boxes >> dst & 1:
+                    continue
+                if dead[dst] and not max_lost:
+                    continue
+                box_set.remove(box)
+                box_set.add(dst)
+                frozen = frozen_deadlock(dst, walls, targets, box_set, freeze_dead, neighbours)
+                new_lost = lost
+                if frozen or dead[dst] or box == lost:
+                    # A box on a dead square stays dead and a frozen one stays
+                    # put, so the lost box only ever follows a push
+                    stuck = set(frozen)
+                    if lost >= 0 and lost != box:
+                        stuck.add(lost)
+                    if dead[dst]:
+                        stuck.add(dst)
+                    if len(stuck) > max_lost:
+                        new_lost = None
+                    else:
+                        new_lost = stuck.pop() if stuck else -1
+                nh = h - cost[box] + cost[dst]
+                estimate = nh
+                if new_lost is not None and new_lost >= 0:
+                    estimate -= cost[new_lost]
+                elif spare_box:
+                    estimate -= max(cost[b] for b in box_set)
+                box_set.remove(dst)
+                box_set.add(box)
+                if new_lost is None:
+                    continue
+                self.stats.nodes_generated += 1
+                yield boxes ^ (1 << box | 1 << dst), nh, new_lost, box, d, estimate
+
+    def bound(self, boxes, h, lost):
+        """Admissible estimate of the pushes left, from the distance sum h:
+        the lost box, or else the farthest one if a box may stay off target,
+        is left out."""
+        if lost >= 0:
+            return h - self.cost[lost]
+        if self.spare_box and boxes:
+            cost = self.cost
+            return h - max(cost[b] for b in bit_cells(boxes))
+        return h
+
+    def remember(self, key, g):
+        """Store g for key. False if key was already seen at g or less."""
+        table = self.table
+        old = table.get(key)
+        if old is not None and old <= g:
+            return False
+        table[key] = g
+        if len(table) + self.stored > self.max_table_size:
+            drop = len(table) // 2
+            for k in list(islice(table, drop)):
+                del table[k]
+            self.stats.evictions += drop
+        elif len(table) > self.stats.peak_table_size:
+            self.stats.peak_table_size = len(table)
+        return True
+
+    def out_of_budget(self):
+        stats = self.stats
+        if stats.nodes_expanded >= self.max_nodes:
+            return True
+        if stats.nodes_expanded % 1024 == 0 and self.deadline is not None:
+            return time.perf_counter() > self.deadline
+        return False
+
+    def start_node(self):
+        start = self.start
+        boxes = sum(1 << b for b in start.boxes)
+        bh = 0
+        for b in start.boxes:
+            bh ^= self.box_keys[b]
+        h = sum(self.cost[b] for b in start.boxes)
+        return boxes, start.player, bh, h, next(iter(self.start_lost()), -1)
+
+    def start_lost(self):
+        """Boxes off target that can never reach one in the start position."""
+        boxes = self.start.boxes
+        return frozenset(b for b in boxes if not self.targets[b] and (
+            self.dead[b] or is_frozen(b, self.walls, boxes, self.freeze_dead, self.neighbours)))
+
+    # ----------------- A* -----------------
+    def astar(self):
+        boxes, player, bh, h, lost = self.start_node()
+        box_keys = self.box_keys
+        player_keys = self.player_keys
+        neighbours = self.neighbours
+        target_bits = self.target_bits
+        f_shift = _H_BITS + _INDEX_BITS
+        # One row per generated node; the open list refers to rows by index
+        node_boxes = [boxes]
+        node_player = array("i", [player])
+        node_hash = array("Q", [bh])
+        node_g = array("i", [0])
+        node_lost = array("i", [lost])
+        node_parent = array("i", [-1])
+        node_push = array("i", [0])         # box * 4 + direction
+        heap = [self.bound(boxes, h, lost) << f_shift | h << _INDEX_BITS]
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        while heap:
+            entry = heappop(heap)
+            index = entry & _INDEX_MASK
+            h = entry >> _INDEX_BITS & _H_MASK
+            boxes = node_boxes[index]
+            g = node_g[index]
+            bh = node_hash[index]
+            area, norm = self.reach(node_player[index], boxes)
+            if not self.remember(bh ^ player_keys[norm], g):
+                continue
+            self.stats.nodes_expanded += 1
+            walk_to = self.goal(boxes, (boxes & target_bits).bit_count(), area)
+            if walk_to is not None:
+                pushes = []
+                while node_parent[index] >= 0:
+                    pushes.append(divmod(node_push[index], 4))
+                    index = node_parent[index]
+                return SOLVED, pushes[::-1], walk_to
+            if self.out_of_budget():
+                return LIMIT, None, None
+            for moved, nh, nl, box, d, estimate in self.children(boxes, area, h,
+                                                                  node_lost[index]):
+                heappush(heap, (g + 1 + estimate) << f_shift | nh << _INDEX_BITS
+                         | len(node_boxes))
+                node_boxes.append(moved)
+                node_player.append(box)
+                node_hash.append(bh ^ box_keys[box] ^ box_keys[neighbours[box][d]])
+                node_g.append(g + 1)
+                node_lost.append(nl)
+                node_parent.append(index)
+                node_push.append(box * 4 + d)
+            self.stored = len(node_boxes)
+            if self.stored > self.max_table_size:
+                self.reason = "stored nodes reached max_table_size"
+                return LIMIT, None, None
+        return UNSOLVABLE, None, None
+
+    # ----------------- IDA* -----------------
+    def idastar(self):
+        boxes, player, bh, h, lost = root = self.start_node()
+        box_keys = self.box_keys
+        player_keys = self.player_keys
+        target_bits = self.target_bits
+        threshold = self.bound(boxes, h, lost)
+        while True:
+            self.table.clear()
+            next_threshold = None
+            boxes, player, bh, h, lost = root
+            stack = [(0, h, threshold, boxes, player, bh, lost, None)]
+            while stack:
+                g, h, estimate, boxes, player, bh, lost, chain = stack.pop()
+                f = g + estimate
+                if f > threshold:
+                    if next_threshold is None or f < next_threshold:
+                        next_threshold = f
+                    continue
+                area, norm = self.reach(player, boxes)
+                if not self.remember(bh ^ player_keys[norm], g):
+                    continue
+                self.stats.nodes_expanded += 1
+                walk_to = self.goal(boxes, (boxes & target_bits).bit_count(), area)
+                if walk_to is not None:
+                    pushes = []
+                    while chain is not None:
+                        chain, box, d = chain
+                        pushes.append((box, d))
+                    return SOLVED, pushes[::-1], walk_to
+                if self.out_of_budget():
+                    return LIMIT, None, None
+                children = sorted(self.children(boxes, area, h, lost),
+                                  key=lambda c: c[1], reverse=True)
+                for moved, nh, nl, box, d, estimate in children:
+                    nbh = bh ^ box_keys[box] ^ box_keys[self.neighbours[box][d]]
+                    stack.append((g + 1, nh, estimate, moved, box, nbh, nl, (chain, box, d)))
+            if next_threshold is None:
+                return UNSOLVABLE, None, None
+            threshold = next_threshold
+
+    # ----------------- Solution -----------------
+    def walk(self, start, goal, boxes):
+        """Shortest list of directions for the player from start to goal."""
+        if start == goal:
+            return []
+        walls = self.walls
+        came = {start: None}
+        frontier = [start]
+        while frontier:
+            following = []
+            for c in frontier:
+                for d, n in enumerate(self.neighbours[c]):
+                    if n < 0 or n in came or walls[n] or n in boxes:
+                        continue
+                    came[n] = (c, d)
+                    if n == goal:
+                        path = []
+                        while came[n] is not None:
+                            n, d = came[n]
+                            path.append(d)
+                        return path[::-1]
+                    following.append(n)
+            frontier = following
+        raise ValueError("no path")     # the search only pushes from reachable cells
+
+    def moves(self, pushes, walk_to):
+        """Directions and pushed flags that play `pushes`, a list of (box, direction)."""
+        boxes = set(self.start.boxes)
+        player = self.start.player
+        moves = []
+        pushed = []
+        for box, d in pushes:
+            path = self.walk(player, self.neighbours[box][(d + 2) % 4], boxes)
+            moves += path
+            pushed += [False] * len(path)
+            moves.append(d)
+            pushed.append(True)
+            boxes.remove(box)
+            boxes.add(self.neighbours[box][d])
+            player = box
+        if walk_to >= 0:
+            path = self.walk(player, walk_to, boxes)
+            moves += path
+            pushed += [False] * len(path)
+        return moves, pushed
+
+
+def solve(grid, algorithm="astar", max_nodes=1_000_000, time_limit=10.0,
+          max_table_size=2_000_000):
+    """Find a push-optimal solution for a levels.json-style grid.
+
+    Returns a SolveResult; its status is SOLVED, UNSOLVABLE, LIMIT (budget
+    ran out first) or INVALID.
+    """
+    started = time.perf_counter()
+    search = _Search(grid, max_nodes, time_limit, max_table_size)
+    if time_limit is not None:
+        search.deadline = started + time_limit
+
+    start = search.start
+    if start.player is None:
+        return SolveResult(INVALID, stats=search.stats, reason="no player")
+    if len(start.boxes) > len(search.target_list):
+        return SolveResult(INVALID, stats=search.stats, reason="more boxes than targets")
+    if len(search.target_list) > len(start.boxes) + 1:
+        return SolveResult(INVALID, stats=search.stats, reason="not enough boxes")
+    if len(search.start_lost()) > search.max_lost:
+        search.stats.elapsed = time.perf_counter() - started
+        return SolveResult(UNSOLVABLE, stats=search.stats, reason="boxes stuck off target")
+
+    if algorithm == "astar":
+        status, pushes, walk_to = search.astar()
+    elif algorithm == "idastar":
+        status, pushes, walk_to = search.idastar()
+    else:
+        raise ValueError(f"unknown algorithm: {algorithm}")
+
+    result = SolveResult(status, stats=search.stats, reason=search.reason)
+    if status == SOLVED:
+        result.moves, result.pushed = search.moves(pushes, walk_to)
+        result.pushes = sum(result.pushed)
+    search.stats.elapsed = time.perf_counter() - started
+    return result
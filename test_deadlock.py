@@ -0,0 +1,33 @@
+from deadlock import DeadlockWatch
+from sokoban_state import SokobanState
+
+
+def play(state, watch, moves):
+    for dx, dy in moves:
+        state.dirty.clear()
+        assert state.move(dx, dy)
+        watch.update(state.dirty)
+
+
+def test_box_pushed_along_dead_wall_is_not_counted_twice():
+    # The box stays on dead squares while it slides along the top wall, but
+    # check_win() lets the player cover the target, so the level is not lost
+    state = SokobanState([[1, 1, 1, 1, 1, 1, 1],
+                          [1, 2, 3, 0, 0, 0, 1],
+                          [1, 0, 0, 0, 0, 4, 1],
+                          [1, 1, 1, 1, 1, 1, 1]])
+    watch = DeadlockWatch(state)
+    play(state, watch, [(1, 0), (1, 0)])
+    assert watch.stuck == state.boxes
+    assert not watch.deadlocked()
+    assert watch.cells() == set()
+
+
+def test_two_boxes_stuck_is_a_deadlock():
+    state = SokobanState([[1, 1, 1, 1, 1, 1, 1],
+                          [1, 0, 3, 0, 3, 2, 1],
+                          [1, 0, 0, 4, 4, 0, 1],
+                          [1, 1, 1, 1, 1, 1, 1]])
+    watch = DeadlockWatch(state)
+    assert watch.deadlocked()
+    assert watch.cells() == state.boxes
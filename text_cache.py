@@ -0,0 +1,60 @@
+"""Shared cache of rendered text surfaces.
+
+font.render() is the most expensive call on the menu screens, and almost
+every label is the same from one frame to the next. render_text() keeps
+the surfaces keyed by (font, text, color, antialias) in LRU order and
+drops the least recently used ones once the cache holds more than
+MAX_BYTES of pixels.
+"""
+
+from collections import OrderedDict
+
+MAX_BYTES = 8 * 1024 * 1024
+
+
+class TextCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()  # key -> surface, least recently used first
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        size = surface.get_pitch() * surface.get_height()
+        if size > self.max_bytes:
+            return surface     # would evict everything else; not worth keeping
+        self._surfaces[key] = surface
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, old = self._surfaces.popitem(last=False)
+            self.bytes -= old.get_pitch() * old.get_height()
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self.bytes = 0
+
+
+_cache = TextCache()
+
+
+def render_text(font, text, color, antialias=True):
+    """font.render(text, antialias, color), from the shared cache."""
+    return _cache.render(font, text, color, antialias)
+
+
+def text_cache():
+    return _cache
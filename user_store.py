@@ -0,0 +1,185 @@
+"""User accounts from users.json, cached and indexed by username.
+
+The file is only re-read when its mtime/size/inode change, so a login is a
+dict lookup. Saves show up in memory at once and are committed by the
+write-behind thread (persistence.py): under a lock file, re-applied to the
+file as it is on disk, and written through a temp file plus os.replace().
+Registrations go through the same thread, in order with the saves, but are
+checked against the file under the lock: register_async() returns a
+Future that says whether the name was still free, so a name another kiosk
+has just taken is refused instead of silently dropped. Several kiosk
+instances sharing the file never see a half-written users.json or lose
+each other's registrations.
+"""
+
+import json
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from persistence import file_signature, write_json_atomic, writer
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+USER_FILE = "users.json"
+DEFAULT_USERS = [{"username": "admin", "password": "admin", "role": "admin"}]
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on `path + ".lock"`, held for the with-block."""
+    with open(path + ".lock", "a+b") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        else:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _apply(users, changes, registered=None):
+    """`users` with the queued changes made to it, in order. Registrations
+    only count once committed: with `registered`, a list, each is checked
+    against the users so far and its (future, added) appended there."""
+    users = list(users)
+    for kind, data in changes:
+        if kind == "save":
+            users = list(data)
+        elif kind == "register" and registered is not None:
+            user, future = data
+            added = all(u["username"] != user["username"] for u in users)
+            if added:
+                users.append(user)
+            registered.append((future, added))
+    return users
+
+
+class UserStore:
+    def __init__(self, path=USER_FILE, write_behind=True):
+        self.path = path
+        self.write_behind = write_behind
+        self._users = []
+        self._index = {}
+        self._signature = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._unsaved = []      # changes not on disk yet, oldest first
+        self._committed = None  # (signature, users) of our own last write
+
+    def _refresh(self):
+        """Re-read the file if it changed since we last loaded it."""
+        signature = file_signature(self.path)
+        if self._loaded and signature == self._signature:
+            return
+        with self._lock:
+            committed = self._committed
+        if signature is None:
+            users = DEFAULT_USERS
+            if not self._loaded:
+                self._change(("create", None))
+        elif committed is not None and committed[0] == signature:
+            users = committed[1]    # our own write: no need to read it back
+        else:
+            with open(self.path, "r") as f:
+                try:
+                    users = json.load(f)
+                except json.JSONDecodeError:
+                    users = []
+        self._signature = signature
+        self._loaded = True
+        with self._lock:
+            unsaved = list(self._unsaved)
+        self._set(_apply(users, unsaved))
+
+    def _set(self, users):
+        self._users = users
+        self._index = {}
+        for u in users:
+            self._index.setdefault(u["username"], u)
+
+    def users(self):
+        self._refresh()
+        return list(self._users)
+
+    def get(self, username):
+        self._refresh()
+        return self._index.get(username)
+
+    def authenticate(self, username, password):
+        u = self.get(username)
+        if u is not None and u["password"] == password:
+            return u
+        return None
+
+    def register_async(self, username, password, role="player"):
+        """Future of True once the user is on disk, or False if the name is
+        taken, here or by another kiosk."""
+        future = Future()
+        self._refresh()
+        if username in self._index:
+            future.set_result(False)
+            return future
+        user = {"username": username, "password": password, "role": role}
+        self._change(("register", (user, future)))
+        return future
+
+    def register(self, username, password, role="player"):
+        """register_async(), waiting for the answer."""
+        return self.register_async(username, password, role).result()
+
+    def save(self, users):
+        self._change(("save", [dict(u) for u in users]))
+
+    def _change(self, change):
+        with self._lock:
+            self._unsaved.append(change)
+        if change[0] != "register":     # a new user shows up once it is committed
+            self._set(_apply(self._users, [change]))
+        if self.write_behind:
+            writer().submit(("users", self.path), self._commit, change)
+        else:
+            self._commit([change])
+
+    def _read_locked(self):
+        """The users on disk; call with file_lock held."""
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return list(DEFAULT_USERS)
+        except json.JSONDecodeError:
+            return []
+
+    def _commit(self, changes):
+        # Runs on the writer thread; another instance may have written since our last read
+        registered = []
+        try:
+            with file_lock(self.path):
+                users = _apply(self._read_locked(), changes, registered)
+                write_json_atomic(self.path, users)
+                signature = file_signature(self.path)
+        except BaseException as exc:
+            # Saves stay queued in memory; registrations are answered either way
+            with self._lock:
+                self._unsaved = [c for c in self._unsaved if c[0] != "register"
+                                 or all(c is not d for d in changes)]
+            for kind, data in changes:
+                if kind == "register" and not data[1].done():
+                    data[1].set_exception(exc)
+            raise
+        with self._lock:
+            self._committed = (signature, users)
+            self._unsaved = [c for c in self._unsaved if all(c is not d for d in changes)]
+        for future, added in registered:
+            future.set_result(added)
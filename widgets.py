@@ -0,0 +1,102 @@
+import pygame
+
+from text_cache import render_text
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+BLUE = (0, 120, 255)
+GRAY = (180, 180, 180)
+
+
+def draw_text(screen, font, text, x, y, color=BLACK):
+    return screen.blit(render_text(font, text, color), (x, y))
+
+
+# ----------------- Input Box -----------------
+class InputBox:
+    def __init__(self, x, y, w, h, font, text="", is_password=False):
+        self.rect = pygame.Rect(x, y, w, h)
+        self.font = font
+        self.color_inactive = GRAY
+        self.color_active = BLUE
+        self.color = self.color_inactive
+        self.text = text
+        self.txt_surface = render_text(font, text, BLACK)
+        self.active = False
+        self.is_password = is_password
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            self.active = self.rect.collidepoint(event.pos)
+            self.color = self.color_active if self.active else self.color_inactive
+        if event.type == pygame.KEYDOWN and self.active:
+            if event.key == pygame.K_BACKSPACE:
+                self.text = self.text[:-1]
+            else:
+                self.text += event.unicode
+            # Mask if password
+            display_text = "●" * len(self.text) if self.is_password else self.text
+            self.txt_surface = render_text(self.font, display_text, BLACK)
+
+    def draw(self, screen):
+        pygame.draw.rect(screen, WHITE, self.rect, border_radius=10)
+        pygame.draw.rect(screen, self.color, self.rect, 2, border_radius=10)
+        screen.blit(self.txt_surface, (self.rect.x + 10, self.rect.y + 8))
+
+
+# ----------------- Button -----------------
+class Button:
+    def __init__(self, x, y, w, h, text, color, font, text_color=BLACK):
+        self.rect = pygame.Rect(x, y, w, h)
+        self.font = font
+        self.base_color = color
+        self.hover_color = tuple(max(0, c - 30) for c in color)   # darker hover
+        self.pressed_color = tuple(max(0, c - 60) for c in color) # darker pressed
+        self.text = text
+        self.text_color = text_color
+        self.is_pressed = False
+        self._faces = None
+        self._faces_text = None
+
+    def _build_faces(self):
+        """Pre-render the whole button for each state: normal, hover, pressed."""
+        label = render_text(self.font, self.text, self.text_color)
+        rect = pygame.Rect(0, 0, self.rect.w, self.rect.h)
+        faces = {}
+        for state, color, shift in (("normal", self.base_color, 0), ("hover", self.hover_color, 0),
+                                    ("pressed", self.pressed_color, 2)):
+            face = pygame.Surface(rect.size, pygame.SRCALPHA)
+            pygame.draw.rect(face, color, rect, border_radius=12)
+            text_rect = label.get_rect(center=rect.center)
+            text_rect.move_ip(0, shift)  # shift text slightly down when pressed
+            face.blit(label, text_rect)
+            if pygame.display.get_surface() is not None:
+                face = face.convert_alpha()
+            faces[state] = face
+        self._faces = faces
+        self._faces_text = self.text
+
+    def draw(self, screen):
+        if self._faces is None or self._faces_text != self.text:
+            self._build_faces()
+        mouse_pos = pygame.mouse.get_pos()
+        if self.rect.collidepoint(mouse_pos):
+            state = "pressed" if self.is_pressed else "hover"
+        else:
+            state = "normal"
+        return screen.blit(self._faces[state], self.rect)
+
+    def handle_event(self, event):
+        """Handles press + release state and returns True if fully clicked"""
+        if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
+            self.is_pressed = True
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if self.is_pressed and self.rect.collidepoint(event.pos):
+                self.is_pressed = False
+                return True  # full click detected
+            self.is_pressed = False
+        return False
+
+    def is_clicked(self, event):
+        """Alias for backwards compatibility"""
+        return self.handle_event(event)